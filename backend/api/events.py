@@ -0,0 +1,129 @@
+"""In-process publish/subscribe hub for dataset and job events, served as SSE."""
+import asyncio
+import itertools
+import json
+import threading
+from collections import deque
+
+DATASET_CREATED = 'dataset-created'
+DATASET_TRIMMED = 'dataset-trimmed'
+DATASET_UPDATED = 'dataset-updated'
+JOB_PROGRESS = 'job-progress'
+
+
+def _offer(queue, event):
+    """Enqueue without blocking; a subscriber that falls behind loses its oldest events."""
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(event)
+
+
+class EventBroker:
+    """Fans events out to every open stream.
+
+    Publishing is thread-safe (sync views run in worker threads under ASGI);
+    each subscriber owns an asyncio queue that is fed on its own event loop.
+    A short backlog lets reconnecting clients resume from ``Last-Event-ID``.
+    Events only reach subscribers in the same process.
+    """
+
+    def __init__(self, backlog=200, queue_size=500):
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._recent = deque(maxlen=backlog)
+        self._subscribers = set()
+        self._queue_size = queue_size
+
+    def publish(self, event_type, data) -> dict:
+        with self._lock:
+            event = {'id': next(self._ids), 'event': event_type, 'data': data}
+            self._recent.append(event)
+            subscribers = list(self._subscribers)
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(_offer, queue, event)
+            except RuntimeError:
+                # Subscriber's loop already closed; it unsubscribes on its way out.
+                pass
+        return event
+
+    def subscribe(self, last_event_id=None):
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=self._queue_size)
+        with self._lock:
+            if last_event_id is not None:
+                for event in self._recent:
+                    if event['id'] > last_event_id:
+                        _offer(queue, event)
+            subscription = (loop, queue)
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+
+broker = EventBroker()
+
+
+def publish(event_type, data) -> dict:
+    return broker.publish(event_type, data)
+
+
+def format_sse(event) -> str:
+    """Encode an event dict in the text/event-stream wire format."""
+    return f"id: {event['id']}\nevent: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+
+
+async def stream(last_event_id=None, keepalive=15):
+    """Yield SSE frames until the client disconnects."""
+    subscription = broker.subscribe(last_event_id)
+    queue = subscription[1]
+    try:
+        yield 'retry: 3000\n\n'
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=keepalive)
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            yield format_sse(event)
+    finally:
+        broker.unsubscribe(subscription)
+
+
+def cancel_on_disconnect(app, paths):
+    """ASGI middleware that cancels long-lived responses when the client leaves.
+
+    Django 4.2 stops reading ``receive`` once the request body is consumed, so a
+    streaming response never sees ``http.disconnect`` and ``stream`` would keep
+    its subscription forever. For ``paths`` the messages are pumped through a
+    queue, and the app task is cancelled on disconnect, which runs the
+    generator's ``finally``.
+    """
+    async def wrapper(scope, receive, send):
+        if scope['type'] != 'http' or scope['path'] not in paths:
+            return await app(scope, receive, send)
+        messages = asyncio.Queue()
+
+        async def pump():
+            while True:
+                message = await receive()
+                await messages.put(message)
+                if message['type'] == 'http.disconnect':
+                    return
+
+        app_task = asyncio.ensure_future(app(scope, messages.get, send))
+        pump_task = asyncio.ensure_future(pump())
+        try:
+            await asyncio.wait({app_task, pump_task}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in (pump_task, app_task):
+                if not task.done():
+                    task.cancel()
+            await asyncio.gather(pump_task, app_task, return_exceptions=True)
+        if not app_task.cancelled() and app_task.exception() is not None:
+            raise app_task.exception()
+
+    return wrapper
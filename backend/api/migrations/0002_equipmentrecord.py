@@ -0,0 +1,38 @@
+# Generated by Django 4.2
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EquipmentRecord",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("row_index", models.IntegerField()),
+                ("equipment_name", models.CharField(blank=True, max_length=255)),
+                ("equipment_type", models.CharField(blank=True, max_length=255)),
+                ("flowrate", models.FloatField(null=True)),
+                ("pressure", models.FloatField(null=True)),
+                ("temperature", models.FloatField(null=True)),
+                (
+                    "dataset",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="records",
+                        to="api.equipmentdataset",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["dataset", "row_index"],
+                "indexes": [models.Index(fields=["dataset", "row_index"], name="api_record_dataset_row_idx")],
+            },
+        ),
+    ]
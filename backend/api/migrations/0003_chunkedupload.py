@@ -0,0 +1,54 @@
+# Generated by Django 4.2
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0002_equipmentrecord"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ChunkedUpload",
+            fields=[
+                ("id", models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ("name", models.CharField(default="Untitled", max_length=255)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("size", models.BigIntegerField()),
+                ("chunk_size", models.IntegerField()),
+                ("total_chunks", models.IntegerField()),
+                ("mode", models.CharField(default="lenient", max_length=16)),
+                ("next_chunk", models.IntegerField(default=0)),
+                ("rows_parsed", models.IntegerField(default=0)),
+                ("columns", models.JSONField(default=list)),
+                ("carry", models.BinaryField(default=b"")),
+                ("validation", models.JSONField(default=dict)),
+                ("error", models.TextField(blank=True)),
+                ("locked_at", models.DateTimeField(null=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name="equipmentrecord",
+            name="dataset",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="records",
+                to="api.equipmentdataset",
+            ),
+        ),
+        migrations.AddField(
+            model_name="equipmentrecord",
+            name="upload",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="records",
+                to="api.chunkedupload",
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0003_chunkedupload"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="equipmentrecord",
+            name="outlier_flags",
+            field=models.SmallIntegerField(default=0),
+        ),
+    ]
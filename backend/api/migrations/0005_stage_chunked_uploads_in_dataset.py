@@ -0,0 +1,45 @@
+# Generated by Django 4.2
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def drop_pending_uploads(apps, schema_editor):
+    # Rows staged against an upload cannot be carried over; those uploads are
+    # dropped and clients start them again.
+    apps.get_model("api", "EquipmentRecord").objects.filter(upload__isnull=False).delete()
+    apps.get_model("api", "ChunkedUpload").objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0004_equipmentrecord_outlier_flags"),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_pending_uploads, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name="equipmentrecord",
+            name="upload",
+        ),
+        migrations.AddField(
+            model_name="chunkedupload",
+            name="totals",
+            field=models.JSONField(default=dict),
+        ),
+        migrations.AddField(
+            model_name="chunkedupload",
+            name="dataset",
+            field=models.OneToOneField(
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="pending_upload",
+                to="api.equipmentdataset",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="equipmentrecord",
+            index=models.Index(fields=["dataset", "equipment_name"], name="api_record_dataset_name_idx"),
+        ),
+    ]
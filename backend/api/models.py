@@ -1,6 +1,14 @@
+import uuid
+
 from django.db import models
 
 
+class EquipmentDatasetQuerySet(models.QuerySet):
+    def visible(self):
+        """Datasets that are not still being filled by a chunked upload."""
+        return self.filter(pending_upload__isnull=True)
+
+
 class EquipmentDataset(models.Model):
     """Stores metadata for each uploaded CSV dataset (last 5 kept)."""
     name = models.CharField(max_length=255, default='Untitled')
@@ -8,5 +16,54 @@ class EquipmentDataset(models.Model):
     row_count = models.IntegerField(default=0)
     summary_json = models.JSONField(default=dict)
 
+    objects = EquipmentDatasetQuerySet.as_manager()
+
     class Meta:
         ordering = ['-uploaded_at']
+
+
+class ChunkedUpload(models.Model):
+    """A resumable upload in progress; chunks are parsed as soon as they are contiguous.
+
+    Parsed rows go straight into ``dataset``, which stays hidden until the
+    upload is finalized. ``totals`` holds the running summary aggregates.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    name = models.CharField(max_length=255, default='Untitled')
+    created_at = models.DateTimeField(auto_now_add=True)
+    size = models.BigIntegerField()
+    chunk_size = models.IntegerField()
+    total_chunks = models.IntegerField()
+    mode = models.CharField(max_length=16, default='lenient')
+    next_chunk = models.IntegerField(default=0)
+    rows_parsed = models.IntegerField(default=0)
+    columns = models.JSONField(default=list)
+    carry = models.BinaryField(default=b'')
+    validation = models.JSONField(default=dict)
+    error = models.TextField(blank=True)
+    locked_at = models.DateTimeField(null=True)
+    totals = models.JSONField(default=dict)
+    dataset = models.OneToOneField(
+        EquipmentDataset, on_delete=models.CASCADE, null=True, related_name='pending_upload'
+    )
+
+
+class EquipmentRecord(models.Model):
+    """One parsed CSV row, kept so reports can stream the full data table."""
+    dataset = models.ForeignKey(EquipmentDataset, on_delete=models.CASCADE, null=True, related_name='records')
+    row_index = models.IntegerField()
+    equipment_name = models.CharField(max_length=255, blank=True)
+    equipment_type = models.CharField(max_length=255, blank=True)
+    flowrate = models.FloatField(null=True)
+    pressure = models.FloatField(null=True)
+    temperature = models.FloatField(null=True)
+    # Bitmask of parameters flagged as per-type outliers (services.OUTLIER_BITS).
+    outlier_flags = models.SmallIntegerField(default=0)
+
+    class Meta:
+        ordering = ['dataset', 'row_index']
+        indexes = [
+            models.Index(fields=['dataset', 'row_index'], name='api_record_dataset_row_idx'),
+            # Chunked uploads look up earlier rows by name to count duplicates.
+            models.Index(fields=['dataset', 'equipment_name'], name='api_record_dataset_name_idx'),
+        ]
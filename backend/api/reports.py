@@ -0,0 +1,278 @@
+"""PDF report rendering with ReportLab.
+
+Charts are built once per summary as vector ``Drawing`` objects and cached;
+the data table is drawn straight onto the canvas page by page from stored
+rows, so no flowable list of the whole dataset is ever held in memory.
+"""
+import json
+import tempfile
+from functools import lru_cache
+
+from reportlab.graphics import renderPDF
+from reportlab.graphics.charts.barcharts import VerticalBarChart
+from reportlab.graphics.charts.piecharts import Pie
+from reportlab.graphics.shapes import Drawing, String
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.units import inch
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen import canvas
+
+from .services import OUTLIER_BITS, RECORD_FIELDS
+
+CHART_COLORS = ['#3b82f6', '#10b981', '#f59e0b', '#ef4444', '#8b5cf6', '#ec4899']
+NUMERIC_COLUMNS = ['Flowrate', 'Pressure', 'Temperature']
+
+PAGE_WIDTH, PAGE_HEIGHT = letter
+MARGIN = 0.75 * inch
+ROW_HEIGHT = 14
+FONT = 'Helvetica'
+FONT_BOLD = 'Helvetica-Bold'
+FONT_SIZE = 8
+# Equipment Name, Type, then the three numeric columns.
+COLUMN_WIDTHS = [2.3 * inch, 1.6 * inch, 1.0 * inch, 1.0 * inch, 1.1 * inch]
+ROWS_PER_PAGE = int((PAGE_HEIGHT - 2 * MARGIN - 3 * ROW_HEIGHT) // ROW_HEIGHT)
+
+
+def _distribution_chart(distribution: dict) -> Drawing:
+    drawing = Drawing(3.2 * inch, 2.6 * inch)
+    drawing.add(String(0, 2.45 * inch, 'Equipment Type Distribution', fontName=FONT_BOLD, fontSize=10))
+    if not distribution:
+        drawing.add(String(0, 1.2 * inch, 'No data', fontName=FONT, fontSize=9, fillColor=colors.grey))
+        return drawing
+    pie = Pie()
+    pie.x, pie.y = 0.2 * inch, 0.2 * inch
+    pie.width = pie.height = 2.0 * inch
+    pie.data = list(distribution.values())
+    pie.labels = [f'{k} ({v})' for k, v in distribution.items()]
+    pie.simpleLabels = 1
+    pie.slices.fontName = FONT
+    pie.slices.fontSize = 7
+    pie.slices.strokeColor = colors.white
+    for i in range(len(pie.data)):
+        pie.slices[i].fillColor = colors.HexColor(CHART_COLORS[i % len(CHART_COLORS)])
+    drawing.add(pie)
+    return drawing
+
+
+def _averages_chart(averages: dict, outlier_counts: dict) -> Drawing:
+    drawing = Drawing(3.2 * inch, 2.6 * inch)
+    drawing.add(String(0, 2.45 * inch, 'Parameter Averages', fontName=FONT_BOLD, fontSize=10))
+    values = [averages.get(c) or 0 for c in NUMERIC_COLUMNS]
+    chart = VerticalBarChart()
+    chart.x, chart.y = 0.4 * inch, 0.45 * inch
+    chart.width, chart.height = 2.6 * inch, 1.75 * inch
+    chart.data = [values]
+    chart.categoryAxis.categoryNames = [
+        f'{c}\n{outlier_counts[c]} outliers' if outlier_counts.get(c) else c for c in NUMERIC_COLUMNS
+    ]
+    chart.categoryAxis.labels.fontName = FONT
+    chart.categoryAxis.labels.fontSize = 7
+    chart.valueAxis.valueMin = 0
+    chart.valueAxis.labels.fontName = FONT
+    chart.valueAxis.labels.fontSize = 7
+    chart.bars[0].fillColor = colors.HexColor(CHART_COLORS[0])
+    for i, c in enumerate(NUMERIC_COLUMNS):
+        if outlier_counts.get(c):
+            chart.bars[(0, i)].fillColor = colors.HexColor('#ef4444')
+    drawing.add(chart)
+    return drawing
+
+
+@lru_cache(maxsize=32)
+def _chart_drawings(summary_key: str) -> tuple:
+    summary = json.loads(summary_key)
+    return (
+        _distribution_chart(summary.get('equipment_type_distribution', {})),
+        _averages_chart(summary.get('averages', {}), summary.get('outliers', {}).get('counts', {})),
+    )
+
+
+def chart_drawings(summary: dict) -> tuple:
+    """Return the (distribution, averages) drawings, built once per distinct summary."""
+    return _chart_drawings(json.dumps(summary, sort_keys=True))
+
+
+def _fit(text: str, width: float, font=FONT, size=FONT_SIZE) -> str:
+    if stringWidth(text, font, size) <= width:
+        return text
+    while text and stringWidth(text + '...', font, size) > width:
+        text = text[:-1]
+    return text + '...'
+
+
+def _format_cell(value) -> str:
+    if value is None:
+        return '-'
+    if isinstance(value, float):
+        return f'{value:.2f}'
+    return str(value)
+
+
+class _ReportCanvas:
+    """Thin wrapper that tracks the cursor and page numbers on a canvas."""
+
+    def __init__(self, fileobj, title):
+        self.c = canvas.Canvas(fileobj, pagesize=letter, pageCompression=1)
+        self.c.setTitle(title)
+        self.page = 1
+
+    def footer(self):
+        self.c.setFont(FONT, 7)
+        self.c.setFillColor(colors.grey)
+        self.c.drawRightString(PAGE_WIDTH - MARGIN, MARGIN / 2, f'Page {self.page}')
+        self.c.setFillColor(colors.black)
+
+    def new_page(self):
+        self.footer()
+        self.c.showPage()
+        self.page += 1
+
+    def table_header(self, y):
+        self.c.setFillColor(colors.HexColor('#1e293b'))
+        self.c.rect(MARGIN, y - 4, sum(COLUMN_WIDTHS), ROW_HEIGHT, stroke=0, fill=1)
+        self.c.setFillColor(colors.white)
+        self.c.setFont(FONT_BOLD, FONT_SIZE)
+        x = MARGIN
+        for col, w in zip(RECORD_FIELDS, COLUMN_WIDTHS):
+            self.c.drawString(x + 3, y, col)
+            x += w
+        self.c.setFillColor(colors.black)
+        self.c.setFont(FONT, FONT_SIZE)
+
+    def table_row(self, y, row, shaded):
+        """Draw one stored row; the last value is its outlier bitmask."""
+        *values, flags = row
+        if flags:
+            self.c.setFillColor(colors.HexColor('#fee2e2'))
+        elif shaded:
+            self.c.setFillColor(colors.HexColor('#f1f5f9'))
+        if flags or shaded:
+            self.c.rect(MARGIN, y - 4, sum(COLUMN_WIDTHS), ROW_HEIGHT, stroke=0, fill=1)
+            self.c.setFillColor(colors.black)
+        x = MARGIN
+        for col, value, w in zip(RECORD_FIELDS, values, COLUMN_WIDTHS):
+            text = _fit(_format_cell(value), w - 6)
+            if col in OUTLIER_BITS:
+                outlier = flags & OUTLIER_BITS[col]
+                if outlier:
+                    self.c.setFont(FONT_BOLD, FONT_SIZE)
+                    self.c.setFillColor(colors.HexColor('#b91c1c'))
+                self.c.drawRightString(x + w - 3, y, text)
+                if outlier:
+                    self.c.setFont(FONT, FONT_SIZE)
+                    self.c.setFillColor(colors.black)
+            else:
+                self.c.drawString(x + 3, y, text)
+            x += w
+
+    def save(self):
+        self.footer()
+        self.c.save()
+
+
+def _draw_summary(rc, ds):
+    c = rc.c
+    summary = ds.summary_json or {}
+    y = PAGE_HEIGHT - MARGIN
+    c.setFont(FONT_BOLD, 16)
+    c.drawString(MARGIN, y, 'Chemical Equipment Parameter Report')
+    y -= 0.4 * inch
+    c.setFont(FONT, 10)
+    c.drawString(MARGIN, y, _fit(f'Dataset: {ds.name}', PAGE_WIDTH - 2 * MARGIN, size=10))
+    y -= 14
+    c.drawString(MARGIN, y, f'Generated: {ds.uploaded_at.strftime("%Y-%m-%d %H:%M")}')
+    y -= 0.35 * inch
+    c.setFont(FONT_BOLD, 12)
+    c.drawString(MARGIN, y, 'Summary')
+    y -= 16
+    c.setFont(FONT, 10)
+    av = summary.get('averages', {})
+    c.drawString(MARGIN, y, f'Total equipment count: {summary.get("total_count", 0)}')
+    y -= 14
+    c.drawString(
+        MARGIN, y,
+        f'Averages - Flowrate: {av.get("Flowrate", "-")}, Pressure: {av.get("Pressure", "-")}, '
+        f'Temperature: {av.get("Temperature", "-")}',
+    )
+    validation = summary.get('validation')
+    if validation:
+        y -= 14
+        checks = ', '.join(
+            f"{i['check']}{' ' + i['column'] if i.get('column') else ''}: {i['count']}"
+            for i in validation.get('issues', [])
+        )
+        c.drawString(
+            MARGIN, y,
+            _fit(f'Data quality issues: {validation.get("issue_count", 0)}' + (f' ({checks})' if checks else ''),
+                 PAGE_WIDTH - 2 * MARGIN, size=10),
+        )
+    outliers = summary.get('outliers')
+    if outliers and outliers.get('status'):
+        y -= 14
+        state = 'still being computed' if outliers['status'] == 'pending' else 'could not be computed'
+        c.drawString(MARGIN, y, f'Per-type outliers: {state}; refresh the report later')
+    elif outliers:
+        y -= 14
+        counts = ', '.join(f'{k}: {v}' for k, v in outliers.get('counts', {}).items())
+        c.drawString(
+            MARGIN, y,
+            _fit(f'Per-type outliers (median/MAD, threshold {outliers.get("threshold")}): '
+                 f'{outliers.get("row_count", 0)} rows, highlighted in the table',
+                 PAGE_WIDTH - 2 * MARGIN, size=10),
+        )
+        if counts:
+            y -= 14
+            c.drawString(MARGIN + 12, y, _fit(counts, PAGE_WIDTH - 2 * MARGIN - 12, size=10))
+    y -= 0.2 * inch
+    distribution, averages = chart_drawings(summary)
+    y -= distribution.height
+    renderPDF.draw(distribution, c, MARGIN, y)
+    renderPDF.draw(averages, c, MARGIN + distribution.width + 0.2 * inch, y)
+    return y - 0.3 * inch
+
+
+def _draw_table(rc, rows, y):
+    """Draw rows from an iterator, starting a new page whenever one fills up."""
+    c = rc.c
+    c.setFont(FONT_BOLD, 12)
+    c.drawString(MARGIN, y, 'Data Table')
+    y -= ROW_HEIGHT + 4
+    rc.table_header(y)
+    y -= ROW_HEIGHT
+    n = 0
+    for row in rows:
+        if y < MARGIN:
+            rc.new_page()
+            y = PAGE_HEIGHT - MARGIN
+            rc.table_header(y)
+            y -= ROW_HEIGHT
+        rc.table_row(y, row, shaded=n % 2 == 1)
+        y -= ROW_HEIGHT
+        n += 1
+    if n == 0:
+        c.setFont(FONT, FONT_SIZE)
+        c.drawString(MARGIN + 3, y, 'No stored rows for this dataset.')
+
+
+def build_report(ds):
+    """Render the report for ``ds`` into an anonymous temp file, rewound for reading.
+
+    The file is removed when closed, e.g. by ``FileResponse`` once it is sent.
+    """
+    out = tempfile.TemporaryFile()
+    try:
+        rc = _ReportCanvas(out, f'Equipment report - {ds.name}')
+        y = _draw_summary(rc, ds)
+        rows = (
+            ds.records.order_by('row_index')
+            .values_list(*RECORD_FIELDS.values(), 'outlier_flags')
+            .iterator(chunk_size=ROWS_PER_PAGE * 20)
+        )
+        _draw_table(rc, rows, y)
+        rc.save()
+    except Exception:
+        out.close()
+        raise
+    out.seek(0)
+    return out
@@ -1,13 +1,40 @@
 """Data parsing and analytics using Pandas."""
+from itertools import islice, repeat
+
+import numpy as np
 import pandas as pd
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, Min
+
+from .models import EquipmentRecord
 
 
 REQUIRED_COLUMNS = ['Equipment Name', 'Type', 'Flowrate', 'Pressure', 'Temperature']
+NUMERIC_COLUMNS = ['Flowrate', 'Pressure', 'Temperature']
+DEFAULT_VALUE_RANGES = {
+    'Flowrate': (0, None),
+    'Pressure': (0, None),
+    'Temperature': (-273.15, None),
+}
+# Bit per parameter in EquipmentRecord.outlier_flags.
+OUTLIER_BITS = {'Flowrate': 1, 'Pressure': 2, 'Temperature': 4}
+# Modified z-score constants: 0.6745 makes MAD consistent with the standard
+# deviation of a normal distribution, 1.2533 (sqrt(pi/2)) does so for the
+# mean absolute deviation.
+MAD_SCALE = 0.6745
+MEAN_AD_SCALE = 1.2533
+RECORD_FIELDS = {
+    'Equipment Name': 'equipment_name',
+    'Type': 'equipment_type',
+    'Flowrate': 'flowrate',
+    'Pressure': 'pressure',
+    'Temperature': 'temperature',
+}
 
 
-def parse_csv(file) -> pd.DataFrame:
-    """Parse uploaded CSV and validate columns."""
-    df = pd.read_csv(file)
+def select_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Strip header whitespace and keep the required columns, in order."""
     df.columns = df.columns.str.strip()
     missing = [c for c in REQUIRED_COLUMNS if c not in df.columns]
     if missing:
@@ -15,10 +42,194 @@ def parse_csv(file) -> pd.DataFrame:
     return df[REQUIRED_COLUMNS]
 
 
+def parse_csv(file) -> pd.DataFrame:
+    """Parse uploaded CSV and validate columns."""
+    return select_columns(pd.read_csv(file))
+
+
+class CSVValidationError(ValueError):
+    """Raised in strict mode when the data-quality pass finds any issue."""
+
+    def __init__(self, report: dict):
+        super().__init__(f"CSV failed validation with {report['issue_count']} issue(s)")
+        self.report = report
+
+
+def _issue(check, mask, column=None, limit=10) -> dict | None:
+    count = int(mask.sum())
+    if not count:
+        return None
+    issue = {'check': check, 'count': count, 'rows': np.flatnonzero(mask)[:limit].tolist()}
+    if column:
+        issue['column'] = column
+    return issue
+
+
+def validate_dataframe(
+    df: pd.DataFrame, strict: bool = False, check_duplicates: bool = True
+) -> tuple[pd.DataFrame, dict]:
+    """Vectorized data-quality pass over a parsed frame.
+
+    Coerces numeric columns (unparseable values become NaN and are left out of
+    averages), then flags missing/non-numeric values, out-of-range values,
+    duplicate equipment names and types outside ``EQUIPMENT_TYPES``. Row
+    indices in the report are 0-based data rows, capped per check. In strict
+    mode any issue raises ``CSVValidationError``. Chunked uploads skip the
+    duplicate check here and run it over all staged rows on finalize.
+    """
+    limit = getattr(settings, 'VALIDATION_MAX_ROWS_REPORTED', 10)
+    ranges = getattr(settings, 'EQUIPMENT_VALUE_RANGES', DEFAULT_VALUE_RANGES)
+    vocabulary = getattr(settings, 'EQUIPMENT_TYPES', None)
+    df = df.copy()
+    issues = []
+    for col in NUMERIC_COLUMNS:
+        raw = df[col]
+        missing = raw.isna().to_numpy()
+        values = raw if pd.api.types.is_numeric_dtype(raw) else pd.to_numeric(raw, errors='coerce')
+        arr = values.to_numpy(dtype=float, na_value=np.nan)
+        invalid = np.isnan(arr)
+        issues.append(_issue('missing', missing, col, limit))
+        issues.append(_issue('non_numeric', invalid & ~missing, col, limit))
+        lo, hi = ranges.get(col, (None, None))
+        out_of_range = np.zeros(len(arr), dtype=bool)
+        with np.errstate(invalid='ignore'):
+            if lo is not None:
+                out_of_range |= arr < lo
+            if hi is not None:
+                out_of_range |= arr > hi
+        issues.append(_issue('out_of_range', out_of_range, col, limit))
+        df[col] = arr
+    names = df['Equipment Name']
+    issues.append(_issue('missing', names.isna().to_numpy(), 'Equipment Name', limit))
+    if check_duplicates:
+        duplicated = (names.duplicated(keep=False) & names.notna()).to_numpy()
+        issues.append(_issue('duplicate', duplicated, 'Equipment Name', limit))
+    if vocabulary:
+        issues.append(_issue('unknown_type', (~df['Type'].isin(vocabulary)).to_numpy(), 'Type', limit))
+    issues = [i for i in issues if i]
+    report = _report(issues, len(df), strict)
+    if strict and issues:
+        raise CSVValidationError(report)
+    return df, report
+
+
+def _report(issues, row_count, strict) -> dict:
+    return {
+        'mode': 'strict' if strict else 'lenient',
+        'row_count': row_count,
+        'issue_count': sum(i['count'] for i in issues),
+        'issues': issues,
+    }
+
+
+def merge_validation(report: dict, part: dict, offset: int) -> dict:
+    """Fold the report for rows ``offset..`` into a running report."""
+    limit = getattr(settings, 'VALIDATION_MAX_ROWS_REPORTED', 10)
+    merged = {(i['check'], i.get('column')): i for i in report.get('issues', [])}
+    for issue in part['issues']:
+        rows = [r + offset for r in issue['rows']]
+        key = (issue['check'], issue.get('column'))
+        if key in merged:
+            current = merged[key]
+            current['count'] += issue['count']
+            current['rows'] = (current['rows'] + rows)[:limit]
+        else:
+            merged[key] = {**issue, 'rows': rows}
+    issues = list(merged.values())
+    return _report(issues, report.get('row_count', 0) + part['row_count'], part['mode'] == 'strict')
+
+
+def accumulate_duplicates(totals: dict, records, df: pd.DataFrame, start: int) -> dict:
+    """Fold a chunk's duplicate equipment names into running ``totals``.
+
+    Call before the chunk (rows ``start..``) is stored; ``records`` are the
+    rows stored so far. Only this chunk's names are looked up, so the cost
+    does not grow with the upload. Matches ``validate_dataframe``: every row
+    whose name occurs more than once counts.
+    """
+    limit = getattr(settings, 'VALIDATION_MAX_ROWS_REPORTED', 10)
+    names = df['Equipment Name']
+    present = names.notna().to_numpy()
+    chunk = names[present].astype(str)
+    earlier = {}
+    unique = chunk.unique().tolist()
+    for i in range(0, len(unique), 500):
+        found = (
+            records.filter(equipment_name__in=unique[i:i + 500])
+            .values('equipment_name')
+            .annotate(n=Count('id'), first=Min('row_index'))
+        )
+        earlier.update({r['equipment_name']: (r['n'], r['first']) for r in found})
+    seen_before = chunk.map({k: n for k, (n, _) in earlier.items()}).fillna(0)
+    duplicated = ((chunk.map(chunk.value_counts()) + seen_before) > 1).to_numpy()
+    # Names seen exactly once before now repeat, so that first row counts too.
+    newly = [first for n, first in earlier.values() if n == 1]
+    current = totals.get('duplicates', {'count': 0, 'rows': []})
+    rows = (np.flatnonzero(present)[duplicated] + start)[:limit].tolist()
+    return {**totals, 'duplicates': {
+        'count': current['count'] + int(duplicated.sum()) + len(newly),
+        'rows': sorted(current['rows'] + newly + rows)[:limit],
+    }}
+
+
+def detect_outliers(df: pd.DataFrame) -> tuple[np.ndarray, dict]:
+    """Flag per-``Type`` outliers with the median/MAD modified z-score.
+
+    One grouped pass per statistic; groups whose MAD is zero fall back to the
+    scaled mean absolute deviation. Returns a bitmask per row (see
+    ``OUTLIER_BITS``) and a report with per-parameter counts, the first
+    flagged row indices and the per-type medians/MADs used.
+    """
+    threshold = getattr(settings, 'OUTLIER_THRESHOLD', 3.5)
+    min_group = getattr(settings, 'OUTLIER_MIN_GROUP_SIZE', 3)
+    limit = getattr(settings, 'VALIDATION_MAX_ROWS_REPORTED', 10)
+    values = df[NUMERIC_COLUMNS].astype(float)
+    groups = values.groupby(df['Type'])
+    median = groups.transform('median')
+    deviation = (values - median).abs()
+    dev_groups = deviation.groupby(df['Type'])
+    mad = dev_groups.transform('median')
+    # With MAD = 0 the score becomes deviation / (1.2533 * MeanAD); folding the
+    # 0.6745 numerator into the spread keeps a single formula for both cases.
+    spread = mad.where(mad > 0, dev_groups.transform('mean') * (MEAN_AD_SCALE * MAD_SCALE))
+    size = groups.transform('count')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        score = MAD_SCALE * deviation / spread.where(spread > 0)
+    flagged = (score > threshold) & (size >= min_group)
+    flags = np.zeros(len(df), dtype=np.int16)
+    counts = {}
+    for col in NUMERIC_COLUMNS:
+        mask = flagged[col].to_numpy()
+        flags |= np.where(mask, OUTLIER_BITS[col], 0).astype(np.int16)
+        counts[col] = int(mask.sum())
+    by_type = {}
+    stats = pd.concat({'median': groups.median(), 'mad': dev_groups.median()}, axis=1).round(3)
+    for type_name, row in stats.iterrows():
+        by_type[str(type_name)] = {
+            col: {k: (None if pd.isna(row[(k, col)]) else float(row[(k, col)])) for k in ('median', 'mad')}
+            for col in NUMERIC_COLUMNS
+        }
+    report = {
+        'method': 'mad',
+        'threshold': threshold,
+        'counts': counts,
+        'row_count': int(np.count_nonzero(flags)),
+        'rows': np.flatnonzero(flags)[:limit].tolist(),
+        'by_type': by_type,
+    }
+    return flags, report
+
+
+def outlier_columns(flags: int) -> list:
+    return [col for col, bit in OUTLIER_BITS.items() if flags & bit]
+
+
 def compute_summary(df: pd.DataFrame) -> dict:
     """Compute total count, averages, and equipment type distribution."""
-    numeric_cols = ['Flowrate', 'Pressure', 'Temperature']
-    averages = df[numeric_cols].mean().round(2).to_dict()
+    averages = {
+        k: (None if pd.isna(v) else v)
+        for k, v in df[NUMERIC_COLUMNS].mean().round(2).to_dict().items()
+    }
     type_counts = df['Type'].value_counts().to_dict()
     return {
         'total_count': len(df),
@@ -27,13 +238,121 @@ def compute_summary(df: pd.DataFrame) -> dict:
     }
 
 
-def get_summary_and_records(file) -> tuple[dict, list]:
-    """Parse CSV and return summary + list of records for API/PDF."""
-    df = parse_csv(file)
-    summary = compute_summary(df)
+def accumulate_summary(totals: dict, df: pd.DataFrame) -> dict:
+    """Fold a parsed chunk into running ``totals`` for ``summary_from_totals``."""
+    sums = dict(totals.get('sums', {}))
+    counts = dict(totals.get('counts', {}))
+    types = dict(totals.get('types', {}))
+    for col in NUMERIC_COLUMNS:
+        sums[col] = sums.get(col, 0.0) + float(df[col].sum())
+        counts[col] = counts.get(col, 0) + int(df[col].count())
+    for name, n in df['Type'].value_counts().items():
+        types[str(name)] = types.get(str(name), 0) + int(n)
+    return {**totals, 'rows': totals.get('rows', 0) + len(df), 'sums': sums, 'counts': counts, 'types': types}
+
+
+def summary_from_totals(totals: dict) -> dict:
+    """Same shape as ``compute_summary``, from running totals."""
+    counts = totals.get('counts', {})
+    return {
+        'total_count': totals.get('rows', 0),
+        'averages': {
+            c: (round(totals['sums'][c] / counts[c], 2) if counts.get(c) else None) for c in NUMERIC_COLUMNS
+        },
+        'equipment_type_distribution': dict(
+            sorted(totals.get('types', {}).items(), key=lambda item: item[1], reverse=True)
+        ),
+    }
+
+
+def frame_to_records(df: pd.DataFrame) -> list:
+    """Row dicts with floats rounded to 2 places and NaN as None."""
     records = df.to_dict(orient='records')
     for r in records:
         for k, v in r.items():
-            if isinstance(v, float) and pd.notna(v):
-                r[k] = round(v, 2)
-    return summary, records
+            if isinstance(v, float):
+                r[k] = round(v, 2) if pd.notna(v) else None
+    return records
+
+
+def analyze_csv(file, strict: bool = False) -> tuple[pd.DataFrame, np.ndarray, dict]:
+    """Parse and validate CSV; return the cleaned frame, outlier flags and summary.
+
+    The summary carries the validation and outlier reports.
+    """
+    df, report = validate_dataframe(parse_csv(file), strict=strict)
+    flags, outliers = detect_outliers(df)
+    summary = compute_summary(df)
+    summary['validation'] = report
+    summary['outliers'] = outliers
+    return df, flags, summary
+
+
+def records_with_outliers(df: pd.DataFrame, flags: np.ndarray) -> list:
+    """Row dicts, each with an ``Outliers`` list naming its flagged parameters."""
+    records = frame_to_records(df)
+    for r, f in zip(records, flags.tolist()):
+        r['Outliers'] = outlier_columns(f)
+    return records
+
+
+def get_summary_and_records(file, strict: bool = False) -> tuple[dict, list]:
+    """Parse and validate CSV; return summary (with validation and outlier reports) + records.
+
+    Each record carries an ``Outliers`` list naming its flagged parameters.
+    """
+    df, flags, summary = analyze_csv(file, strict=strict)
+    return summary, records_with_outliers(df, flags)
+
+
+def flag_stored_outliers(records, batch_size=500) -> dict:
+    """Run ``detect_outliers`` over stored rows and write back only the flagged ones.
+
+    Returns the outlier report. Row indices in it are ``row_index`` values.
+    """
+    fields = ['id', 'row_index'] + list(RECORD_FIELDS.values())
+    rows = records.order_by('row_index').values_list(*fields).iterator(chunk_size=10000)
+    df = pd.DataFrame.from_records(rows, columns=['id', 'row_index'] + list(RECORD_FIELDS))
+    df['Type'] = df['Type'].replace('', np.nan)
+    flags, report = detect_outliers(df)
+    ids = df['id'].to_numpy()
+    report['rows'] = df['row_index'].to_numpy()[np.flatnonzero(flags)][:len(report['rows'])].tolist()
+    for value in np.unique(flags[flags > 0]).tolist():
+        matching = ids[flags == value].tolist()
+        for i in range(0, len(matching), batch_size):
+            EquipmentRecord.objects.filter(pk__in=matching[i:i + batch_size]).update(outlier_flags=value)
+    return report
+
+
+def store_records(df: pd.DataFrame, flags=None, dataset=None, start=0, batch_size=5000) -> None:
+    """Persist parsed rows of ``dataset`` so reports can stream them back later.
+
+    ``start`` offsets ``row_index`` for rows that continue an earlier batch.
+    Values are converted column-wise and inserted with ``executemany``, since
+    building one model instance per row dominates the upload time.
+    """
+    n = len(df)
+    if not n:
+        return
+    columns = []
+    for col in RECORD_FIELDS:
+        if col in NUMERIC_COLUMNS:
+            values = df[col].to_numpy(dtype=float, na_value=np.nan).round(2)
+            cells = values.astype(object)
+            cells[np.isnan(values)] = None
+        else:
+            cells = df[col].astype(str).to_numpy(dtype=object)
+            cells[df[col].isna().to_numpy()] = ''
+        columns.append(cells.tolist())
+    flags = np.zeros(n, dtype=np.int16) if flags is None else np.asarray(flags)
+    meta = EquipmentRecord._meta
+    names = ['dataset_id', 'row_index', *RECORD_FIELDS.values(), 'outlier_flags']
+    qn = connection.ops.quote_name
+    sql = (
+        f'INSERT INTO {qn(meta.db_table)} ({", ".join(qn(c) for c in names)}) '
+        f'VALUES ({", ".join(["%s"] * len(names))})'
+    )
+    rows = zip(repeat(dataset.pk), range(start, start + n), *columns, flags.tolist())
+    with connection.cursor() as cursor:
+        while batch := list(islice(rows, batch_size)):
+            cursor.executemany(sql, batch)
\ No newline at end of file
@@ -0,0 +1,332 @@
+import asyncio
+import io
+import re
+import tempfile
+from unittest import mock
+
+from django.db import DatabaseError
+from django.test import AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from . import events, uploads, views
+from .models import ChunkedUpload, EquipmentDataset
+from .reports import ROWS_PER_PAGE, build_report
+from .services import (
+    CSVValidationError,
+    analyze_csv,
+    detect_outliers,
+    get_summary_and_records,
+    merge_validation,
+    parse_csv,
+    store_records,
+    validate_dataframe,
+)
+
+HEADER = 'Equipment Name,Type,Flowrate,Pressure,Temperature\n'
+
+
+def csv_file(rows):
+    return io.BytesIO((HEADER + ''.join(r + '\n' for r in rows)).encode())
+
+
+def issues_by_key(report):
+    return {(i['check'], i.get('column')): i for i in report['issues']}
+
+
+class EventStreamDisconnectTests(SimpleTestCase):
+    async def test_disconnect_releases_subscription(self):
+        async def app(scope, receive, send):
+            await receive()
+            await send({'type': 'http.response.start', 'status': 200, 'headers': []})
+            async for part in events.stream(keepalive=0.01):
+                await send({'type': 'http.response.body', 'body': part.encode(), 'more_body': True})
+
+        messages = asyncio.Queue()
+        await messages.put({'type': 'http.request', 'body': b'', 'more_body': False})
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        before = len(events.broker._subscribers)
+        wrapped = events.cancel_on_disconnect(app, {'/api/events/'})
+        task = asyncio.ensure_future(wrapped({'type': 'http', 'path': '/api/events/'}, messages.get, send))
+        await asyncio.sleep(0.05)
+        self.assertEqual(len(events.broker._subscribers), before + 1)
+        await messages.put({'type': 'http.disconnect'})
+        await asyncio.wait_for(task, 1)
+        self.assertEqual(len(events.broker._subscribers), before)
+        self.assertTrue(sent)
+
+
+class EventStreamViewTests(TestCase):
+    async def test_wsgi_request_is_refused(self):
+        response = await views.event_stream(RequestFactory().get('/api/events/'))
+        self.assertEqual(response.status_code, 501)
+
+    async def test_asgi_request_requires_authentication(self):
+        response = await views.event_stream(AsyncRequestFactory().get('/api/events/'))
+        self.assertEqual(response.status_code, 401)
+
+
+@override_settings(EQUIPMENT_TYPES=['Pump', 'Reactor'], VALIDATION_MAX_ROWS_REPORTED=2)
+class ValidationTests(SimpleTestCase):
+    rows = [
+        'P1,Pump,10,2,40',
+        'P2,Pump,abc,2,40',
+        'P3,Pump,,2,40',
+        'P1,Reactor,-5,2,40',
+        'V1,Valve,10,-1,40',
+        'P4,Pump,x,2,y',
+        'P5,Pump,y,2,40',
+    ]
+
+    def test_issue_counts_and_row_indices(self):
+        _, report = validate_dataframe(parse_csv(csv_file(self.rows)))
+        issues = issues_by_key(report)
+        self.assertEqual(report['row_count'], 7)
+        self.assertEqual(issues[('non_numeric', 'Flowrate')]['count'], 3)
+        self.assertEqual(issues[('non_numeric', 'Flowrate')]['rows'], [1, 5])
+        self.assertEqual(issues[('missing', 'Flowrate')]['rows'], [2])
+        self.assertEqual(issues[('out_of_range', 'Flowrate')]['rows'], [3])
+        self.assertEqual(issues[('out_of_range', 'Pressure')]['rows'], [4])
+        self.assertEqual(issues[('non_numeric', 'Temperature')]['rows'], [5])
+        self.assertEqual(issues[('duplicate', 'Equipment Name')]['rows'], [0, 3])
+        self.assertEqual(issues[('unknown_type', 'Type')]['rows'], [4])
+        self.assertEqual(report['issue_count'], sum(i['count'] for i in report['issues']))
+
+    def test_invalid_numbers_are_left_out_of_averages(self):
+        summary, records = get_summary_and_records(csv_file(self.rows))
+        self.assertEqual(summary['averages']['Flowrate'], round((10 - 5 + 10) / 3, 2))
+        self.assertIsNone(records[1]['Flowrate'])
+        self.assertEqual(summary['validation']['mode'], 'lenient')
+
+    def test_strict_mode_rejects_with_report(self):
+        with self.assertRaises(CSVValidationError) as ctx:
+            get_summary_and_records(csv_file(self.rows), strict=True)
+        self.assertEqual(ctx.exception.report['mode'], 'strict')
+        self.assertGreater(ctx.exception.report['issue_count'], 0)
+
+    def test_strict_mode_accepts_clean_file(self):
+        summary, _ = get_summary_and_records(csv_file(['P1,Pump,10,2,40', 'R1,Reactor,5,1,90']), strict=True)
+        self.assertEqual(summary['validation']['issue_count'], 0)
+
+    def test_merge_validation_offsets_rows_and_caps(self):
+        _, first = validate_dataframe(parse_csv(csv_file(['A,Pump,x,1,1', 'B,Pump,1,1,1'])))
+        _, second = validate_dataframe(parse_csv(csv_file(['C,Pump,y,1,1', 'D,Pump,z,1,1'])))
+        merged = merge_validation(merge_validation({}, first, 0), second, 2)
+        issue = issues_by_key(merged)[('non_numeric', 'Flowrate')]
+        self.assertEqual(issue['count'], 3)
+        self.assertEqual(issue['rows'], [0, 2])
+        self.assertEqual(merged['row_count'], 4)
+
+
+def send_chunks(data: bytes, chunk_size, order=None, mode='lenient'):
+    """Create an upload for ``data`` and PUT its chunks in ``order`` (default: ascending)."""
+    upload = uploads.create_upload('test.csv', len(data), chunk_size, mode)
+    for index in order if order is not None else range(upload.total_chunks):
+        part = data[index * chunk_size:(index + 1) * chunk_size]
+        uploads.write_chunk(upload, index, io.BytesIO(part))
+    return upload
+
+
+class StoreRecordsTests(TestCase):
+    def test_rows_are_stored_with_nulls_and_flags(self):
+        df, _ = validate_dataframe(parse_csv(csv_file(['P1,Pump,1.234,2,40', ',,abc,,', 'R1,Reactor,5,1,90'])))
+        dataset = EquipmentDataset.objects.create(name='t')
+        store_records(df, [1, 0, 6], dataset=dataset, start=10)
+        rows = list(dataset.records.order_by('row_index').values_list(
+            'row_index', 'equipment_name', 'equipment_type', 'flowrate', 'pressure', 'temperature', 'outlier_flags',
+        ))
+        self.assertEqual(rows, [
+            (10, 'P1', 'Pump', 1.23, 2.0, 40.0, 1),
+            (11, '', '', None, None, None, 0),
+            (12, 'R1', 'Reactor', 5.0, 1.0, 90.0, 6),
+        ])
+
+
+
+class ReportTests(TestCase):
+    def page_count(self, dataset):
+        with build_report(dataset) as f:
+            return len(re.findall(rb'/Type /Page\b(?!s)', f.read()))
+
+    def test_table_continues_over_pages(self):
+        df, flags, summary = analyze_csv(csv_file([f'P{i},Pump,{i},2,40' for i in range(3 * ROWS_PER_PAGE)]))
+        dataset = EquipmentDataset.objects.create(name='big', summary_json=summary)
+        store_records(df, flags, dataset=dataset)
+        # The first page also holds the summary and charts, so three pages of rows need four.
+        self.assertEqual(self.page_count(dataset), 4)
+
+    def test_empty_dataset_fits_one_page(self):
+        self.assertEqual(self.page_count(EquipmentDataset.objects.create(name='empty')), 1)
+
+
+def finalize_upload(upload):
+    """Finalize like a client: call again while the server still has chunks to parse."""
+    while True:
+        try:
+            return uploads.finalize(upload.id)
+        except uploads.UploadIncomplete as e:
+            if e.missing:
+                raise
+
+
+class ChunkedUploadTestCase(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        override = override_settings(UPLOAD_CHUNK_DIR=tmp.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+
+class FinalizeTests(ChunkedUploadTestCase):
+    data = csv_file(['P1,Pump,10,2,40', 'R1,Reactor,5,1,90']).getvalue()
+
+    def test_record_boundary_skips_quoted_newlines(self):
+        data = b'a,"x\ny",1\nb,"p""\nq",2\nc,"open\n'
+        self.assertEqual(uploads._record_boundary(data), data.index(b'c,'))
+        self.assertEqual(uploads._record_boundary(b'"no\nend'), 0)
+        self.assertEqual(uploads._record_boundary(b'a,1\nb,2'), 4)
+
+    def test_chunked_summary_matches_direct_upload(self):
+        rows = [
+            f'"Unit {i}\nline two",{["Pump", "Reactor", "Valve"][i % 3]},{i * 1.25:.2f},{i % 7},{40 + i % 11}'
+            for i in range(60)
+        ]
+        rows[5] = 'Broken,Pump,abc,1,40'
+        rows[7] = 'Spike,Reactor,999,1,40'
+        # Duplicate names, within and across chunks.
+        rows[3] = rows[50] = rows[51] = 'Twin,Pump,3.75,3,43'
+        rows[20] = 'Spike,Reactor,25,6,49'
+        data = csv_file(rows).getvalue()
+        direct, direct_records = get_summary_and_records(io.BytesIO(data))
+        self.assertEqual(direct['outliers']['rows'], [7])
+        for chunk_size, order in [(37, None), (101, None), (64, 'reversed'), (len(data), None)]:
+            with self.subTest(chunk_size=chunk_size, order=order):
+                total = -(-len(data) // chunk_size)
+                upload = send_chunks(data, chunk_size, range(total - 1, -1, -1) if order else None)
+                dataset = finalize_upload(upload)
+                summary = dataset.summary_json
+                for key in ('total_count', 'averages', 'equipment_type_distribution'):
+                    self.assertEqual(summary[key], direct[key])
+                self.assertEqual(issues_by_key(summary['validation']), issues_by_key(direct['validation']))
+                names = list(dataset.records.order_by('row_index').values_list('equipment_name', flat=True))
+                self.assertEqual(names, [r['Equipment Name'] for r in direct_records])
+                self.assertEqual(summary['outliers'], {'status': uploads.OUTLIERS_PENDING})
+                self.assertEqual(uploads.flag_outliers(dataset.id).summary_json['outliers'], direct['outliers'])
+                flagged = dataset.records.exclude(outlier_flags=0).order_by('row_index')
+                self.assertEqual(
+                    list(flagged.values_list('row_index', flat=True)),
+                    [i for i, r in enumerate(direct_records) if r['Outliers']],
+                )
+
+    def test_dataset_is_hidden_until_finalized(self):
+        upload = send_chunks(self.data, 16)
+        self.assertFalse(EquipmentDataset.objects.visible().exists())
+        self.assertEqual(upload.dataset.records.count(), 2)
+        dataset = uploads.finalize(upload.id)
+        self.assertEqual(dataset.pk, upload.dataset_id)
+        self.assertEqual(list(EquipmentDataset.objects.visible()), [dataset])
+
+    def test_discard_drops_hidden_dataset(self):
+        upload = send_chunks(self.data, 16)
+        uploads.discard(upload)
+        self.assertFalse(EquipmentDataset.objects.exists())
+
+    @override_settings(UPLOAD_MAX_CHUNKS_PER_REQUEST=2)
+    def test_parsing_is_capped_per_request(self):
+        upload = send_chunks(self.data, 8, order=range(-(-len(self.data) // 8) - 1, -1, -1))
+        upload.refresh_from_db()
+        self.assertEqual(upload.next_chunk, 2)
+        with self.assertRaises(uploads.UploadIncomplete) as ctx:
+            uploads.finalize(upload.id)
+        self.assertEqual(ctx.exception.missing, [])
+        self.assertEqual(finalize_upload(upload).summary_json['total_count'], 2)
+
+    def test_stale_claim_holder_stops_after_takeover(self):
+        upload = uploads.create_upload('test.csv', len(self.data), 16)
+        for index in range(upload.total_chunks):
+            uploads.chunk_dir(upload).mkdir(parents=True, exist_ok=True)
+            (uploads.chunk_dir(upload) / f'{index}.part').write_bytes(self.data[index * 16:(index + 1) * 16])
+        holder = uploads._claim(upload.id)
+        ChunkedUpload.objects.filter(pk=upload.pk).update(locked_at=holder.locked_at - uploads.LOCK_TIMEOUT * 2)
+        self.assertIsNotNone(uploads._claim(upload.id))
+        self.assertEqual(uploads._parse_available(holder, 10), 0)
+        upload.refresh_from_db()
+        self.assertEqual(upload.next_chunk, 0)
+
+    def test_flag_outliers_skips_trimmed_dataset(self):
+        dataset = uploads.finalize(send_chunks(self.data, 16).id)
+        dataset.delete()
+        self.assertIsNone(uploads.flag_outliers(dataset.id))
+
+    def test_failed_flagging_is_recorded_and_resumed(self):
+        dataset = uploads.finalize(send_chunks(self.data, 16).id)
+        with mock.patch.object(uploads, 'flag_stored_outliers', side_effect=DatabaseError('database is locked')):
+            with self.assertRaises(DatabaseError):
+                uploads.flag_outliers(dataset.id)
+        dataset.refresh_from_db()
+        self.assertEqual(dataset.summary_json['outliers']['status'], uploads.OUTLIERS_FAILED)
+        with mock.patch.object(views, '_flag_outliers_later') as later:
+            views._resume_outliers(EquipmentDataset.objects.visible())
+        later.assert_called_once_with(dataset.id)
+
+    def test_finalize_is_refused_while_claimed(self):
+        upload = send_chunks(self.data, 16)
+        claim = uploads._claim(upload.id)
+        self.assertIsNotNone(claim)
+        with self.assertRaises(uploads.UploadBusy):
+            uploads.finalize(upload.id)
+        uploads._release(claim)
+        uploads.finalize(upload.id)
+        with self.assertRaises(ChunkedUpload.DoesNotExist):
+            uploads.finalize(upload.id)
+        self.assertEqual(EquipmentDataset.objects.count(), 1)
+
+
+class DiscardedUploadTests(ChunkedUploadTestCase):
+    data = csv_file(['P1,Pump,10,2,40', 'R1,Reactor,5,1,90']).getvalue()
+
+    def test_chunk_for_discarded_upload_leaves_no_files(self):
+        upload = uploads.create_upload('test.csv', len(self.data), 16)
+        uploads.discard(ChunkedUpload.objects.get(pk=upload.pk))
+        with self.assertRaises(ChunkedUpload.DoesNotExist):
+            uploads.write_chunk(upload, 0, io.BytesIO(self.data[:16]))
+        self.assertFalse(uploads.chunk_dir(upload).exists())
+
+    def test_parse_after_discard_does_not_resurrect_upload(self):
+        upload = uploads.create_upload('test.csv', len(self.data), 16)
+        uploads.discard(ChunkedUpload.objects.get(pk=upload.pk))
+        uploads.chunk_dir(upload).mkdir(parents=True)
+        (uploads.chunk_dir(upload) / '0.part').write_bytes(self.data[:16])
+        with self.assertRaises(ChunkedUpload.DoesNotExist):
+            uploads._parse_available(upload, 1)
+        self.assertFalse(ChunkedUpload.objects.exists())
+
+
+@override_settings(OUTLIER_THRESHOLD=3.5, OUTLIER_MIN_GROUP_SIZE=3)
+class OutlierTests(SimpleTestCase):
+    def frame(self, rows):
+        return parse_csv(csv_file(rows))
+
+    def test_flags_per_type_outliers(self):
+        rows = [f'P{i},Pump,{10 + i % 3},2,40' for i in range(10)] + ['P99,Pump,500,2,40']
+        rows += [f'R{i},Reactor,500,2,40' for i in range(5)]
+        flags, report = detect_outliers(self.frame(rows))
+        self.assertEqual(report['counts'], {'Flowrate': 1, 'Pressure': 0, 'Temperature': 0})
+        self.assertEqual(report['rows'], [10])
+        self.assertEqual(flags[10], 1)
+        self.assertEqual(report['by_type']['Pump']['Flowrate']['median'], 11.0)
+
+    def test_zero_mad_falls_back_to_mean_absolute_deviation(self):
+        # Median 5, MAD 0, MeanAD 1: the score is 5 / 1.2533 ~ 3.99 > 3.5.
+        flags, report = detect_outliers(self.frame([f'P{i},Pump,1,{p},40' for i, p in enumerate([5, 5, 5, 5, 10])]))
+        self.assertEqual(report['rows'], [4])
+        self.assertEqual(flags.tolist(), [0, 0, 0, 0, 2])
+
+    def test_small_and_constant_groups_are_not_flagged(self):
+        rows = ['A,Pump,1,1,1', 'B,Pump,100,1,1'] + [f'R{i},Reactor,7,7,7' for i in range(4)]
+        flags, report = detect_outliers(self.frame(rows))
+        self.assertEqual(report['row_count'], 0)
+        self.assertFalse(flags.any())
@@ -0,0 +1,393 @@
+"""Resumable chunked CSV uploads.
+
+Protocol: create an upload, PUT numbered chunks (optionally with a SHA-256
+checksum) in any order and in parallel, then finalize. Chunks are written to
+``UPLOAD_CHUNK_DIR`` and parsed as soon as they extend the contiguous run
+from the start of the file. Rows go straight into the upload's hidden dataset
+and the summary is kept as running totals, so finalize only reveals the
+dataset. Outliers need per-type medians over every row, so ``flag_outliers``
+runs after finalize.
+"""
+import hashlib
+import io
+import math
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import events
+from .models import ChunkedUpload, EquipmentDataset
+from .services import (
+    CSVValidationError,
+    accumulate_duplicates,
+    accumulate_summary,
+    flag_stored_outliers,
+    merge_validation,
+    select_columns,
+    store_records,
+    summary_from_totals,
+    validate_dataframe,
+)
+
+READ_SIZE = 64 * 1024
+LOCK_TIMEOUT = timedelta(minutes=5)
+# ``summary['outliers']`` of a chunked upload until flag_outliers stores its report.
+OUTLIERS_PENDING = 'pending'
+OUTLIERS_FAILED = 'failed'
+
+
+class ChunkError(ValueError):
+    """A chunk was out of range, the wrong size or failed its checksum."""
+
+
+class UploadIncomplete(Exception):
+    """Finalize was called before every chunk had been received and parsed."""
+
+    def __init__(self, missing):
+        super().__init__('Upload incomplete' if missing else 'Upload still processing')
+        self.missing = missing
+
+
+class UploadBusy(Exception):
+    """Another request holds the upload's claim, e.g. a finalize already in progress."""
+
+
+def chunk_dir(upload) -> Path:
+    return Path(getattr(settings, 'UPLOAD_CHUNK_DIR', Path(tempfile.gettempdir()) / 'upload_chunks')) / str(upload.id)
+
+
+def create_upload(name, size, chunk_size=None, mode='lenient') -> ChunkedUpload:
+    default = getattr(settings, 'UPLOAD_CHUNK_SIZE', 4 * 1024 * 1024)
+    largest = getattr(settings, 'UPLOAD_MAX_CHUNK_SIZE', 16 * 1024 * 1024)
+    size = int(size)
+    chunk_size = min(int(chunk_size or default), largest)
+    if size <= 0 or chunk_size <= 0:
+        raise ValueError('size and chunk_size must be positive')
+    expire_stale()
+    with transaction.atomic():
+        return ChunkedUpload.objects.create(
+            name=name,
+            size=size,
+            chunk_size=chunk_size,
+            total_chunks=math.ceil(size / chunk_size),
+            mode=mode,
+            dataset=EquipmentDataset.objects.create(name=name),
+        )
+
+
+def expire_stale() -> None:
+    hours = getattr(settings, 'UPLOAD_EXPIRY_HOURS', 24)
+    for upload in ChunkedUpload.objects.filter(created_at__lt=timezone.now() - timedelta(hours=hours)):
+        discard(upload)
+
+
+def discard(upload) -> None:
+    """Drop an upload, its chunk files and its hidden dataset with any rows parsed so far."""
+    shutil.rmtree(chunk_dir(upload), ignore_errors=True)
+    with transaction.atomic():
+        EquipmentDataset.objects.filter(pk=upload.dataset_id).delete()
+        ChunkedUpload.objects.filter(pk=upload.pk).delete()
+
+
+def received_chunks(upload) -> list:
+    d = chunk_dir(upload)
+    on_disk = {int(p.stem) for p in d.glob('*.part')} if d.exists() else set()
+    return sorted(on_disk | set(range(upload.next_chunk)))
+
+
+def upload_status(upload) -> dict:
+    return {
+        'upload_id': str(upload.id),
+        'name': upload.name,
+        'size': upload.size,
+        'chunk_size': upload.chunk_size,
+        'total_chunks': upload.total_chunks,
+        'received': received_chunks(upload),
+        'parsed_chunks': upload.next_chunk,
+        'rows_parsed': upload.rows_parsed,
+        'error': upload.error,
+    }
+
+
+def write_chunk(upload, index, stream, checksum=None) -> None:
+    """Store chunk ``index`` from ``stream`` and parse whatever became contiguous.
+
+    Re-sending a chunk is harmless, so clients can retry freely. Raises
+    ``ChunkedUpload.DoesNotExist`` if the upload was discarded or finalized
+    meanwhile; its chunk directory is not left behind.
+    """
+    if not 0 <= index < upload.total_chunks:
+        raise ChunkError(f'Chunk index {index} out of range')
+    if index < upload.next_chunk:
+        return
+    expected = upload.chunk_size
+    if index == upload.total_chunks - 1:
+        expected = upload.size - upload.chunk_size * (upload.total_chunks - 1)
+    d = chunk_dir(upload)
+    _ensure_exists(upload.pk)
+    d.mkdir(parents=True, exist_ok=True)
+    digest = hashlib.sha256()
+    written = 0
+    fd, tmp = tempfile.mkstemp(dir=d, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            while stream is not None:
+                piece = stream.read(READ_SIZE)
+                if not piece:
+                    break
+                written += len(piece)
+                if written > expected:
+                    raise ChunkError(f'Chunk {index} is larger than {expected} bytes')
+                digest.update(piece)
+                f.write(piece)
+        if written != expected:
+            raise ChunkError(f'Chunk {index} should be {expected} bytes, got {written}')
+        if checksum and checksum.lower() != digest.hexdigest():
+            raise ChunkError(f'Chunk {index} failed checksum verification')
+        os.replace(tmp, d / f'{index}.part')
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+    try:
+        _ensure_exists(upload.pk)
+    except ChunkedUpload.DoesNotExist:
+        # Discarded while this chunk was streaming in.
+        shutil.rmtree(d, ignore_errors=True)
+        raise
+    advance(upload.id)
+
+
+def _ensure_exists(upload_id) -> None:
+    if not ChunkedUpload.objects.filter(pk=upload_id).exists():
+        raise ChunkedUpload.DoesNotExist(f'Upload {upload_id} no longer exists')
+
+
+def _claim(upload_id) -> ChunkedUpload | None:
+    """Take the upload's claim and return it, or ``None`` if another request holds it.
+
+    A claim older than ``LOCK_TIMEOUT`` is considered abandoned and taken over,
+    so holders renew theirs after every chunk.
+    """
+    now = timezone.now()
+    stale = now - LOCK_TIMEOUT
+    claimed = (
+        ChunkedUpload.objects.filter(pk=upload_id)
+        .filter(Q(locked_at__isnull=True) | Q(locked_at__lt=stale))
+        .update(locked_at=now)
+    )
+    if claimed != 1:
+        return None
+    return ChunkedUpload.objects.filter(pk=upload_id, locked_at=now).first()
+
+
+def _renew(upload) -> bool:
+    """Refresh our claim; ``False`` if it went stale and was taken over."""
+    now = timezone.now()
+    renewed = ChunkedUpload.objects.filter(pk=upload.pk, locked_at=upload.locked_at).update(locked_at=now)
+    if renewed:
+        upload.locked_at = now
+    return renewed == 1
+
+
+def _release(upload) -> None:
+    ChunkedUpload.objects.filter(pk=upload.pk, locked_at=upload.locked_at).update(locked_at=None)
+
+
+def advance(upload_id) -> None:
+    """Parse contiguous chunks after the last parsed one.
+
+    Only one request parses an upload at a time. Others return immediately;
+    the holder re-checks for newly arrived chunks after releasing its claim.
+    At most ``UPLOAD_MAX_CHUNKS_PER_REQUEST`` chunks are parsed per call; the
+    rest wait for the next call. An upload discarded mid-parse simply stops
+    being parsed.
+    """
+    budget = getattr(settings, 'UPLOAD_MAX_CHUNKS_PER_REQUEST', 4)
+    while budget > 0:
+        upload = _claim(upload_id)
+        if upload is None:
+            return
+        try:
+            budget -= _parse_available(upload, budget)
+        except ChunkedUpload.DoesNotExist:
+            return
+        finally:
+            _release(upload)
+        ready = chunk_dir(upload) / f'{upload.next_chunk}.part'
+        if upload.error or not ready.exists():
+            break
+
+
+def _parse_available(upload, limit) -> int:
+    """Parse up to ``limit`` ready chunks under the claim held on ``upload``.
+
+    Returns how many were parsed. Stops early if the claim was lost.
+    """
+    d = chunk_dir(upload)
+    parsed = 0
+    while parsed < limit and upload.next_chunk < upload.total_chunks and not upload.error:
+        path = d / f'{upload.next_chunk}.part'
+        if not path.exists():
+            break
+        data = bytes(upload.carry) + path.read_bytes()
+        if upload.next_chunk == upload.total_chunks - 1:
+            body, carry = data, b''
+        else:
+            # Rows straddling a chunk boundary are completed by the next chunk.
+            cut = _record_boundary(data)
+            body, carry = data[:cut], data[cut:]
+        try:
+            with transaction.atomic():
+                # Renewing inside the transaction keeps a takeover from
+                # ingesting the same chunk concurrently.
+                if not _renew(upload):
+                    _ensure_exists(upload.pk)
+                    break
+                try:
+                    _ingest(upload, body)
+                except ValueError as e:
+                    upload.error = str(e)
+                upload.carry = carry
+                upload.next_chunk += 1
+                # A plain save() would re-insert an upload discarded meanwhile.
+                upload.save(force_update=True)
+        except DatabaseError:
+            _ensure_exists(upload.pk)
+            raise
+        parsed += 1
+        path.unlink(missing_ok=True)
+        events.publish(events.JOB_PROGRESS, {
+            'job_id': str(upload.id),
+            'stage': 'parsing',
+            'progress': round(upload.next_chunk / upload.total_chunks, 4),
+        })
+    return parsed
+
+
+def _record_boundary(data: bytes) -> int:
+    """Offset just past the last newline that ends a CSV record in ``data``.
+
+    ``data`` must start at a record boundary. A newline inside a quoted field
+    follows an odd number of quote characters (escaped ``""`` pairs count
+    twice), so only newlines preceded by an even count qualify. Quotes are
+    assumed to appear only around fields, as in RFC 4180.
+    """
+    if b'"' not in data:
+        return data.rfind(b'\n') + 1
+    buf = np.frombuffer(data, dtype=np.uint8)
+    newlines = np.flatnonzero(buf == ord('\n'))
+    # uint8 wraps at 256, which keeps the parity.
+    quotes = np.cumsum(buf == ord('"'), dtype=np.uint8)
+    ends = newlines[quotes[newlines] % 2 == 0]
+    return int(ends[-1]) + 1 if len(ends) else 0
+
+
+def _ingest(upload, body: bytes) -> None:
+    if not upload.columns:
+        if b'\n' not in body and upload.next_chunk < upload.total_chunks - 1:
+            return
+        header, _, body = body.partition(b'\n')
+        columns = pd.read_csv(io.BytesIO(header + b'\n')).columns.str.strip()
+        select_columns(pd.DataFrame(columns=columns))
+        upload.columns = list(columns)
+    if not body.strip():
+        return
+    df = select_columns(pd.read_csv(io.BytesIO(body), header=None, names=upload.columns))
+    df, part = validate_dataframe(df, check_duplicates=False)
+    upload.validation = merge_validation(upload.validation, part, upload.rows_parsed)
+    totals = accumulate_duplicates(upload.totals, upload.dataset.records.all(), df, upload.rows_parsed)
+    upload.totals = accumulate_summary(totals, df)
+    store_records(df, dataset=upload.dataset, start=upload.rows_parsed)
+    upload.rows_parsed += len(df)
+
+
+def finalize(upload_id) -> EquipmentDataset:
+    """Turn a fully parsed upload into a dataset.
+
+    Raises ``UploadIncomplete`` while chunks are missing or still being parsed,
+    ``UploadBusy`` while another request holds the upload's claim,
+    ``CSVValidationError`` in strict mode and ``ValueError`` for unusable files;
+    the last two also discard the upload. The claim is held throughout, so a
+    repeated finalize cannot create a second dataset.
+    """
+    advance(upload_id)
+    ChunkedUpload.objects.get(pk=upload_id)
+    upload = _claim(upload_id)
+    if upload is None:
+        raise UploadBusy('Upload is being processed by another request')
+    try:
+        return _finalize(upload)
+    finally:
+        _release(upload)
+
+
+def _finalize(upload) -> EquipmentDataset:
+    if upload.error:
+        discard(upload)
+        raise ValueError(upload.error)
+    if upload.next_chunk < upload.total_chunks:
+        received = set(received_chunks(upload))
+        raise UploadIncomplete([i for i in range(upload.total_chunks) if i not in received])
+    if not upload.columns:
+        discard(upload)
+        raise ValueError('Uploaded file has no header row')
+    duplicates = upload.totals.get('duplicates', {})
+    dup = {'check': 'duplicate', 'column': 'Equipment Name', **duplicates} if duplicates.get('count') else None
+    report = merge_validation(
+        upload.validation,
+        {'issues': [dup] if dup else [], 'row_count': 0, 'mode': upload.mode},
+        0,
+    )
+    if upload.mode == 'strict' and report['issue_count']:
+        discard(upload)
+        raise CSVValidationError(report)
+    summary = summary_from_totals(upload.totals)
+    summary['validation'] = report
+    summary['outliers'] = {'status': OUTLIERS_PENDING}
+    dataset = upload.dataset
+    dataset.name = upload.name
+    dataset.row_count = summary['total_count']
+    dataset.summary_json = summary
+    dataset.uploaded_at = timezone.now()
+    with transaction.atomic():
+        dataset.save()
+        # Deleting the upload is what makes the dataset visible.
+        upload.delete()
+    shutil.rmtree(chunk_dir(upload), ignore_errors=True)
+    return dataset
+
+
+def outliers_outstanding(summary) -> bool:
+    """Whether a chunked upload's outliers are still pending or failed."""
+    outliers = (summary or {}).get('outliers') or {}
+    return outliers.get('status') in (OUTLIERS_PENDING, OUTLIERS_FAILED)
+
+
+def flag_outliers(dataset_id) -> EquipmentDataset | None:
+    """Flag outliers on a dataset's stored rows and add the report to its summary.
+
+    If flagging fails, the summary records ``{'status': 'failed'}`` instead
+    and the error is re-raised. Returns the updated dataset, or ``None`` if
+    it was trimmed meanwhile.
+    """
+    dataset = EquipmentDataset.objects.filter(pk=dataset_id).first()
+    if dataset is None:
+        return None
+    try:
+        dataset.summary_json['outliers'] = flag_stored_outliers(dataset.records.all())
+    except Exception as e:
+        dataset.summary_json['outliers'] = {'status': OUTLIERS_FAILED, 'error': str(e)}
+        EquipmentDataset.objects.filter(pk=dataset_id).update(summary_json=dataset.summary_json)
+        raise
+    if not EquipmentDataset.objects.filter(pk=dataset_id).update(summary_json=dataset.summary_json):
+        return None
+    return dataset
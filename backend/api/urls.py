@@ -6,4 +6,9 @@ urlpatterns = [
     path('summary/<int:dataset_id>/', views.SummaryView.as_view()),
     path('history/', views.HistoryView.as_view()),
     path('report/<int:dataset_id>/pdf/', views.ReportPDFView.as_view()),
+    path('events/', views.event_stream),
+    path('uploads/', views.ChunkedUploadView.as_view()),
+    path('uploads/<uuid:upload_id>/', views.ChunkedUploadDetailView.as_view()),
+    path('uploads/<uuid:upload_id>/chunks/<int:index>/', views.ChunkView.as_view()),
+    path('uploads/<uuid:upload_id>/finalize/', views.ChunkedUploadFinalizeView.as_view()),
 ]
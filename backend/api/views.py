@@ -1,18 +1,32 @@
-import io
-from rest_framework import status
+import logging
+import threading
+import uuid
+from asgiref.sync import sync_to_async
+from rest_framework import exceptions, status
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.conf import settings
-from django.http import HttpResponse
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
+from django.core.handlers.asgi import ASGIRequest
+from django.db import connections, transaction
+from django.http import FileResponse, JsonResponse, StreamingHttpResponse
 
-from .models import EquipmentDataset
+from . import events, uploads
+from .models import ChunkedUpload, EquipmentDataset
+from .reports import build_report
 from .serializers import EquipmentDatasetSerializer
-from .services import get_summary_and_records, parse_csv, compute_summary
+from .services import (
+    CSVValidationError,
+    analyze_csv,
+    records_with_outliers,
+    parse_csv,
+    compute_summary,
+    store_records,
+)
+
+logger = logging.getLogger(__name__)
 
 
 class UploadCSVView(APIView):
@@ -25,30 +39,183 @@ class UploadCSVView(APIView):
                 {'error': 'Please upload a CSV file.'},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        job_id = request.data.get('job_id') or uuid.uuid4().hex
+        mode = request.data.get('mode') or getattr(settings, 'UPLOAD_VALIDATION_MODE', 'lenient')
+        _progress(job_id, 'parsing', 0.0)
         try:
-            summary, records = get_summary_and_records(csv_file)
-        except Exception as e:
+            df, flags, summary = analyze_csv(csv_file, strict=mode == 'strict')
+        except CSVValidationError as e:
+            _progress(job_id, 'failed', 1.0, error=str(e))
+            return Response(
+                {'error': str(e), 'validation': e.report},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except ValueError as e:
+            # Covers pandas parser errors, undecodable files and missing columns.
+            _progress(job_id, 'failed', 1.0, error=str(e))
             return Response(
                 {'error': str(e)},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        _progress(job_id, 'saving', 0.5)
         name = request.data.get('name', csv_file.name)
-        dataset = EquipmentDataset.objects.create(
-            name=name,
-            row_count=len(records),
-            summary_json=summary
-        )
-        self._trim_history()
+        with transaction.atomic():
+            dataset = EquipmentDataset.objects.create(
+                name=name,
+                row_count=len(df),
+                summary_json=summary
+            )
+            store_records(df, flags, dataset=dataset)
+        events.publish(events.DATASET_CREATED, EquipmentDatasetSerializer(dataset).data)
+        _trim_history()
+        _progress(job_id, 'done', 1.0, dataset_id=dataset.id)
         return Response({
             'dataset_id': dataset.id,
+            'job_id': job_id,
             'summary': summary,
-            'records': records,
+            'records': records_with_outliers(df, flags),
         }, status=status.HTTP_201_CREATED)
 
-    def _trim_history(self):
-        max_n = getattr(settings, 'MAX_HISTORY_DATASETS', 5)
-        for ds in EquipmentDataset.objects.all()[max_n:]:
-            ds.delete()
+
+def _progress(job_id, stage, progress, **extra):
+    events.publish(events.JOB_PROGRESS, {'job_id': job_id, 'stage': stage, 'progress': progress, **extra})
+
+
+def _trim_history():
+    max_n = getattr(settings, 'MAX_HISTORY_DATASETS', 5)
+    trimmed = []
+    for ds in EquipmentDataset.objects.visible()[max_n:]:
+        trimmed.append(ds.id)
+        ds.delete()
+    if trimmed:
+        events.publish(events.DATASET_TRIMMED, {'ids': trimmed})
+
+
+_flagging = set()
+_flagging_lock = threading.Lock()
+
+
+def _flag_outliers_later(dataset_id):
+    """Flag outliers off the request thread; clients get a dataset-updated event.
+
+    Does nothing if this process is already flagging the dataset.
+    """
+    with _flagging_lock:
+        if dataset_id in _flagging:
+            return
+        _flagging.add(dataset_id)
+
+    def run():
+        try:
+            try:
+                dataset = uploads.flag_outliers(dataset_id)
+            except Exception:
+                logger.exception('Outlier flagging failed for dataset %s', dataset_id)
+                dataset = EquipmentDataset.objects.filter(pk=dataset_id).first()
+            if dataset is not None:
+                events.publish(events.DATASET_UPDATED, EquipmentDatasetSerializer(dataset).data)
+        except Exception:
+            logger.exception('Could not publish outliers for dataset %s', dataset_id)
+        finally:
+            with _flagging_lock:
+                _flagging.discard(dataset_id)
+            connections.close_all()
+
+    threading.Thread(target=run, daemon=True).start()
+
+
+def _resume_outliers(datasets):
+    """Restart flagging left pending or failed, e.g. by a restart or a locked database."""
+    for ds in datasets:
+        if uploads.outliers_outstanding(ds.summary_json):
+            _flag_outliers_later(ds.id)
+
+
+class ChunkedUploadView(APIView):
+    """Start a resumable upload: POST name, size and optionally chunk_size/mode."""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        name = request.data.get('name') or 'Untitled'
+        if not name.lower().endswith('.csv'):
+            return Response({'error': 'Please upload a CSV file.'}, status=status.HTTP_400_BAD_REQUEST)
+        mode = request.data.get('mode') or getattr(settings, 'UPLOAD_VALIDATION_MODE', 'lenient')
+        try:
+            upload = uploads.create_upload(name, request.data.get('size'), request.data.get('chunk_size'), mode)
+        except (TypeError, ValueError) as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(uploads.upload_status(upload), status=status.HTTP_201_CREATED)
+
+
+class ChunkedUploadDetailView(APIView):
+    """Upload progress (which chunks the server holds) for resuming, or abort with DELETE."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, upload_id):
+        try:
+            upload = ChunkedUpload.objects.get(pk=upload_id)
+        except ChunkedUpload.DoesNotExist:
+            return Response({'error': 'Upload not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(uploads.upload_status(upload))
+
+    def delete(self, request, upload_id):
+        try:
+            uploads.discard(ChunkedUpload.objects.get(pk=upload_id))
+        except ChunkedUpload.DoesNotExist:
+            return Response({'error': 'Upload not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class ChunkView(APIView):
+    """PUT the raw bytes of one chunk; an ``X-Chunk-SHA256`` header is verified if sent."""
+    permission_classes = [IsAuthenticated]
+    parser_classes = []
+
+    def put(self, request, upload_id, index):
+        try:
+            upload = ChunkedUpload.objects.get(pk=upload_id)
+        except ChunkedUpload.DoesNotExist:
+            return Response({'error': 'Upload not found'}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            uploads.write_chunk(upload, index, request.stream, request.headers.get('X-Chunk-SHA256'))
+            upload.refresh_from_db()
+        except ChunkedUpload.DoesNotExist:
+            return Response({'error': 'Upload not found'}, status=status.HTTP_404_NOT_FOUND)
+        except uploads.ChunkError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(uploads.upload_status(upload))
+
+
+class ChunkedUploadFinalizeView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, upload_id):
+        job_id = str(upload_id)
+        try:
+            dataset = uploads.finalize(upload_id)
+        except ChunkedUpload.DoesNotExist:
+            return Response({'error': 'Upload not found'}, status=status.HTTP_404_NOT_FOUND)
+        except uploads.UploadIncomplete as e:
+            return Response({'error': str(e), 'missing': e.missing}, status=status.HTTP_409_CONFLICT)
+        except uploads.UploadBusy as e:
+            return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+        except CSVValidationError as e:
+            _progress(job_id, 'failed', 1.0, error=str(e))
+            return Response({'error': str(e), 'validation': e.report}, status=status.HTTP_400_BAD_REQUEST)
+        except ValueError as e:
+            _progress(job_id, 'failed', 1.0, error=str(e))
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        events.publish(events.DATASET_CREATED, EquipmentDatasetSerializer(dataset).data)
+        _trim_history()
+        _progress(job_id, 'done', 1.0, dataset_id=dataset.id)
+        _flag_outliers_later(dataset.id)
+        # Rows are not echoed back; large files are the reason to use this path.
+        return Response({
+            'dataset_id': dataset.id,
+            'job_id': job_id,
+            'summary': dataset.summary_json,
+            'records': [],
+        }, status=status.HTTP_201_CREATED)
 
 
 class SummaryView(APIView):
@@ -57,7 +224,8 @@ class SummaryView(APIView):
 
     def get(self, request, dataset_id):
         try:
-            ds = EquipmentDataset.objects.get(pk=dataset_id)
+            ds = EquipmentDataset.objects.visible().get(pk=dataset_id)
+            _resume_outliers([ds])
             return Response({
                 'id': ds.id,
                 'name': ds.name,
@@ -73,7 +241,8 @@ class HistoryView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        datasets = EquipmentDataset.objects.all()[:5]
+        datasets = EquipmentDataset.objects.visible()[:5]
+        _resume_outliers(datasets)
         serializer = EquipmentDatasetSerializer(datasets, many=True)
         return Response(serializer.data)
 
@@ -83,30 +252,49 @@ class ReportPDFView(APIView):
 
     def get(self, request, dataset_id):
         try:
-            ds = EquipmentDataset.objects.get(pk=dataset_id)
+            ds = EquipmentDataset.objects.visible().get(pk=dataset_id)
         except EquipmentDataset.DoesNotExist:
             return Response({'error': 'Dataset not found'}, status=status.HTTP_404_NOT_FOUND)
-        buffer = io.BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=letter, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=18)
-        styles = getSampleStyleSheet()
-        title_style = ParagraphStyle(name='Title', parent=styles['Heading1'], fontSize=16)
-        story = []
-        story.append(Paragraph('Chemical Equipment Parameter Report', title_style))
-        story.append(Spacer(1, 0.25 * inch))
-        story.append(Paragraph(f'Dataset: {ds.name}', styles['Normal']))
-        story.append(Paragraph(f'Generated: {ds.uploaded_at.strftime("%Y-%m-%d %H:%M")}', styles['Normal']))
-        story.append(Spacer(1, 0.25 * inch))
-        summary = ds.summary_json
-        story.append(Paragraph('Summary', styles['Heading2']))
-        story.append(Paragraph(f'Total equipment count: {summary.get("total_count", 0)}', styles['Normal']))
-        av = summary.get('averages', {})
-        story.append(Paragraph(f'Averages - Flowrate: {av.get("Flowrate", "-")}, Pressure: {av.get("Pressure", "-")}, Temperature: {av.get("Temperature", "-")}', styles['Normal']))
-        dist = summary.get('equipment_type_distribution', {})
-        dist_text = ', '.join(f'{k}: {v}' for k, v in dist.items())
-        story.append(Paragraph(f'Type distribution: {dist_text}', styles['Normal']))
-        story.append(Spacer(1, 0.25 * inch))
-        doc.build(story)
-        buffer.seek(0)
-        response = HttpResponse(buffer.getvalue(), content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="equipment_report_{ds.id}.pdf"'
-        return response
+        _resume_outliers([ds])
+        return FileResponse(
+            build_report(ds),
+            as_attachment=True,
+            filename=f'equipment_report_{ds.id}.pdf',
+            content_type='application/pdf',
+        )
+
+
+@sync_to_async
+def _is_authenticated(request):
+    """Run the configured DRF authenticators outside the event loop."""
+    drf_request = Request(
+        request,
+        authenticators=[cls() for cls in api_settings.DEFAULT_AUTHENTICATION_CLASSES],
+    )
+    try:
+        return bool(drf_request.user and drf_request.user.is_authenticated)
+    except exceptions.APIException:
+        return False
+
+
+async def event_stream(request):
+    """Server-sent events for dataset-created/-updated/-trimmed and job-progress.
+
+    Needs an ASGI server. Under WSGI the endless stream would be collected into
+    a list and pin a worker thread per client, so it is refused with 501.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse(
+            {'error': 'Live updates need an ASGI server'}, status=status.HTTP_501_NOT_IMPLEMENTED
+        )
+    if not await _is_authenticated(request):
+        return JsonResponse({'error': 'Authentication required'}, status=status.HTTP_401_UNAUTHORIZED)
+    last_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    try:
+        last_id = int(last_id) if last_id else None
+    except ValueError:
+        last_id = None
+    response = StreamingHttpResponse(events.stream(last_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -1,5 +1,10 @@
+"""ASGI entry point; required for the /api/events/ live event stream."""
 import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'equipment_visualizer.settings')
 application = get_asgi_application()
+
+from api.events import cancel_on_disconnect  # noqa: E402  (needs settings configured)
+
+application = cancel_on_disconnect(application, {'/api/events/'})
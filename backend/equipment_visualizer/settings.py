@@ -87,3 +87,28 @@ REST_FRAMEWORK = {
 }
 
 MAX_HISTORY_DATASETS = 5
+
+# Per-Type outlier detection: rows whose modified z-score (median/MAD) exceeds
+# the threshold are flagged; types with fewer rows than the minimum are skipped.
+OUTLIER_THRESHOLD = 3.5
+OUTLIER_MIN_GROUP_SIZE = 3
+
+# Resumable chunked uploads (/api/uploads/).
+UPLOAD_CHUNK_DIR = BASE_DIR / 'upload_chunks'
+UPLOAD_CHUNK_SIZE = 4 * 1024 * 1024
+UPLOAD_MAX_CHUNK_SIZE = 16 * 1024 * 1024
+UPLOAD_EXPIRY_HOURS = 24
+# Chunks one request parses before returning; a backlog is picked up by the
+# next chunk PUT or finalize call, so no request runs into client timeouts.
+UPLOAD_MAX_CHUNKS_PER_REQUEST = 4
+
+# Upload data-quality checks. 'strict' rejects any file with issues; 'lenient'
+# accepts it and returns the issue report. Clients may override with ``mode``.
+UPLOAD_VALIDATION_MODE = 'lenient'
+VALIDATION_MAX_ROWS_REPORTED = 10
+EQUIPMENT_TYPES = ['Condenser', 'Distillation', 'Heat Exchanger', 'Pump', 'Reactor', 'Storage']
+EQUIPMENT_VALUE_RANGES = {
+    'Flowrate': (0, None),
+    'Pressure': (0, None),
+    'Temperature': (-273.15, None),
+}
@@ -1,8 +1,58 @@
 """API client for Django backend with Basic auth."""
 import base64
-import requests
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 DEFAULT_BASE = "http://localhost:8000/api"
+CHUNK_SIZE = 4 * 1024 * 1024
+# Files above this size go through the resumable chunked upload.
+CHUNKED_UPLOAD_THRESHOLD = 8 * 1024 * 1024
+
+
+def _http():
+    """``requests`` is imported on first use so the desktop app starts faster."""
+    import requests
+
+    return requests
+
+
+def is_connection_error(exc):
+    """True when ``exc`` means the server could not be reached at all."""
+    requests = _http()
+    return isinstance(exc, (requests.ConnectionError, requests.Timeout))
+
+
+def describe_validation(report):
+    """One line per data-quality issue from the server's validation report."""
+    if not report or not report.get("issue_count"):
+        return ""
+    lines = [f"{report['issue_count']} data issue(s) found:"]
+    for i in report.get("issues", []):
+        column = f" in {i['column']}" if i.get("column") else ""
+        more = ", ..." if i["count"] > len(i["rows"]) else ""
+        rows = ", ".join(str(r) for r in i["rows"])
+        lines.append(f"  {i['check']}{column}: {i['count']} (rows {rows}{more})")
+    return "\n".join(lines)
+
+
+class UploadRejected(Exception):
+    """The server refused an upload; carries its error and validation report."""
+
+    def __init__(self, payload):
+        self.error = payload.get("error", "Upload rejected")
+        self.validation = payload.get("validation")
+        super().__init__("\n".join(filter(None, [self.error, describe_validation(self.validation)])))
+
+
+class EventsUnavailable(Exception):
+    """The server cannot stream events (e.g. it runs under WSGI); do not retry."""
+
+
+class UploadCancelled(Exception):
+    """A chunked upload was stopped by its caller; the server copy is discarded."""
 
 
 class EquipmentAPI:
@@ -11,6 +61,8 @@ class EquipmentAPI:
         self.username = username or ""
         self.password = password or ""
         self._auth_header = None
+        # (path, size, mtime) -> upload id, so a retried upload resumes
+        self._pending_uploads = {}
         if username and password:
             self._auth_header = self._make_auth(username, password)
 
@@ -29,32 +81,141 @@ class EquipmentAPI:
         return dict(self._auth_header) if self._auth_header else {}
 
     def login(self, username, password):
+        """Check the credentials; returns the history fetched to do so."""
         self.set_credentials(username, password)
-        r = requests.get(f"{self.base}/history/", headers=self._headers(), timeout=10)
-        r.raise_for_status()
-        return True
+        return self.history()
 
-    def upload_csv(self, path, name=None):
+    def upload_csv(self, path, name=None, job_id=None, mode=None):
         with open(path, "rb") as f:
             files = {"file": (name or path, f, "text/csv")}
             data = {"name": name} if name else {}
-            r = requests.post(
+            if job_id:
+                data["job_id"] = job_id
+            if mode:
+                data["mode"] = mode
+            r = _http().post(
                 f"{self.base}/upload/",
                 headers=self._headers(),
                 files=files,
                 data=data,
                 timeout=30,
             )
+        if r.status_code == 400:
+            raise UploadRejected(r.json())
         r.raise_for_status()
         return r.json()
 
+    def upload_csv_chunked(self, path, name=None, mode=None, chunk_size=CHUNK_SIZE, workers=4, progress=None,
+                           should_stop=None):
+        """Resumable upload: init, PUT checksummed chunks in parallel, finalize.
+
+        Calling again for the same unchanged file after a failure resumes
+        from the chunks the server already holds. ``progress(done, total)``
+        is called from this thread after each chunk. Once ``should_stop()``
+        returns true, in-flight chunks finish, the server upload is deleted
+        and ``UploadCancelled`` is raised.
+        """
+        size = os.path.getsize(path)
+        key = (os.path.abspath(path), size, os.path.getmtime(path))
+        status = None
+        if key in self._pending_uploads:
+            r = _http().get(
+                f"{self.base}/uploads/{self._pending_uploads[key]}/",
+                headers=self._headers(),
+                timeout=10,
+            )
+            if r.ok:
+                status = r.json()
+        if status is None:
+            data = {"name": name or os.path.basename(path), "size": size, "chunk_size": chunk_size}
+            if mode:
+                data["mode"] = mode
+            r = _http().post(f"{self.base}/uploads/", headers=self._headers(), json=data, timeout=10)
+            if r.status_code == 400:
+                raise UploadRejected(r.json())
+            r.raise_for_status()
+            status = r.json()
+            self._pending_uploads[key] = status["upload_id"]
+        upload_id = status["upload_id"]
+        total = status["total_chunks"]
+        received = set(status["received"])
+        missing = [i for i in range(total) if i not in received]
+        resends = 0
+        while resends < 5:
+            try:
+                self._send_chunks(path, upload_id, missing, status["chunk_size"], total, workers, progress,
+                                  should_stop)
+            except UploadCancelled:
+                self._pending_uploads.pop(key, None)
+                _http().delete(f"{self.base}/uploads/{upload_id}/", headers=self._headers(), timeout=10)
+                raise
+            r = _http().post(f"{self.base}/uploads/{upload_id}/finalize/", headers=self._headers(), timeout=60)
+            if r.status_code == 409:
+                missing = r.json().get("missing", [])
+                if missing:
+                    resends += 1
+                else:
+                    # The server is still parsing; each finalize call parses a few more chunks.
+                    time.sleep(0.5)
+                continue
+            if r.status_code == 400:
+                self._pending_uploads.pop(key, None)
+                raise UploadRejected(r.json())
+            r.raise_for_status()
+            self._pending_uploads.pop(key, None)
+            return r.json()
+        raise RuntimeError("Upload could not be finalized; try again to resume.")
+
+    def _send_chunks(self, path, upload_id, indices, chunk_size, total, workers, progress, should_stop=None):
+        if should_stop and should_stop():
+            raise UploadCancelled("Upload cancelled")
+        done = total - len(indices)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(self._put_chunk, path, upload_id, i, chunk_size) for i in indices]
+            try:
+                for fut in as_completed(futures):
+                    fut.result()
+                    done += 1
+                    if progress:
+                        progress(done, total)
+                    if should_stop and should_stop():
+                        raise UploadCancelled("Upload cancelled")
+            except BaseException:
+                for fut in futures:
+                    fut.cancel()
+                raise
+
+    def _put_chunk(self, path, upload_id, index, chunk_size, retries=3):
+        with open(path, "rb") as f:
+            f.seek(index * chunk_size)
+            data = f.read(chunk_size)
+        headers = self._headers()
+        headers["Content-Type"] = "application/octet-stream"
+        headers["X-Chunk-SHA256"] = hashlib.sha256(data).hexdigest()
+        for attempt in range(retries):
+            try:
+                r = _http().put(
+                    f"{self.base}/uploads/{upload_id}/chunks/{index}/",
+                    headers=headers,
+                    data=data,
+                    timeout=60,
+                )
+                if r.status_code == 400:
+                    raise UploadRejected(r.json())
+                r.raise_for_status()
+                return
+            except _http().RequestException:
+                if attempt == retries - 1:
+                    raise
+                time.sleep(2 ** attempt)
+
     def history(self):
-        r = requests.get(f"{self.base}/history/", headers=self._headers(), timeout=10)
+        r = _http().get(f"{self.base}/history/", headers=self._headers(), timeout=10)
         r.raise_for_status()
         return r.json()
 
     def summary(self, dataset_id):
-        r = requests.get(
+        r = _http().get(
             f"{self.base}/summary/{dataset_id}/",
             headers=self._headers(),
             timeout=10,
@@ -63,10 +224,15 @@ class EquipmentAPI:
         return r.json()
 
     def download_pdf(self, dataset_id, save_path):
-        r = requests.get(
+        """Save the dataset's PDF report to ``save_path``.
+
+        The server renders the whole report before sending anything, which
+        takes a while for large datasets, so only connecting has a timeout.
+        """
+        r = _http().get(
             f"{self.base}/report/{dataset_id}/pdf/",
             headers=self._headers(),
-            timeout=30,
+            timeout=(10, None),
             stream=True,
         )
         r.raise_for_status()
@@ -74,3 +240,48 @@ class EquipmentAPI:
             for chunk in r.iter_content(8192):
                 f.write(chunk)
         return save_path
+
+    def events(self, last_event_id=None, should_stop=None):
+        """Yield server-sent events as dicts with id, event and data keys.
+
+        Blocks between events; the server sends keepalives so ``should_stop``
+        is polled at least every few seconds. Raises ``EventsUnavailable`` if
+        the server cannot stream at all.
+        """
+        headers = self._headers()
+        headers["Accept"] = "text/event-stream"
+        if last_event_id is not None:
+            headers["Last-Event-ID"] = str(last_event_id)
+        with _http().get(
+            f"{self.base}/events/",
+            headers=headers,
+            stream=True,
+            timeout=(10, 60),
+        ) as r:
+            if r.status_code in (501, 503):
+                raise EventsUnavailable(r.json().get("error", "Live updates unavailable"))
+            r.raise_for_status()
+            event = {"id": None, "event": "message", "data": []}
+            for line in r.iter_lines(chunk_size=None, decode_unicode=True):
+                if should_stop and should_stop():
+                    return
+                if line:
+                    if line.startswith(":"):
+                        continue
+                    field, _, value = line.partition(":")
+                    value = value[1:] if value.startswith(" ") else value
+                    if field == "id":
+                        event["id"] = value
+                    elif field == "event":
+                        event["event"] = value
+                    elif field == "data":
+                        event["data"].append(value)
+                    continue
+                if event["data"]:
+                    payload = "\n".join(event["data"])
+                    try:
+                        event["data"] = json.loads(payload)
+                    except ValueError:
+                        event["data"] = payload
+                    yield event
+                event = {"id": None, "event": "message", "data": []}
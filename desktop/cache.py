@@ -0,0 +1,122 @@
+"""Local on-disk cache (SQLite) of history, summaries and records.
+
+Entries are scoped per server and user so the window can render the last
+known state immediately after sign-in, and keep working offline. Offline
+sign-in is checked against a salted hash of the last credentials that the
+server accepted, so a typed username alone never opens a cache.
+"""
+import hashlib
+import hmac
+import json
+import os
+import sqlite3
+import time
+from pathlib import Path
+
+CACHE_DIR = Path(os.environ.get("EQUIPMENT_CACHE_DIR", Path.home() / ".equipment_visualizer"))
+# Larger uploads are not worth keeping row by row on the client.
+MAX_CACHED_RECORDS = 50000
+CREDENTIAL_ITERATIONS = 200_000
+
+
+def _scope(base_url, username):
+    return f"{username}@{base_url}"
+
+
+def _derive(password, salt, iterations):
+    return hashlib.pbkdf2_hmac("sha256", password.encode(), salt, iterations).hex()
+
+
+class LocalCache:
+    def __init__(self, path=None):
+        path = Path(path or CACHE_DIR / "cache.sqlite3")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(path))
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "scope TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, updated_at REAL NOT NULL, "
+            "PRIMARY KEY (scope, key))"
+        )
+        self.conn.commit()
+        self.scope = None
+
+    def use_scope(self, base_url, username):
+        """Switch to the entries of one server/user and remember it for next launch.
+
+        Only call this once the credentials were accepted by the server or by
+        ``check_credentials``.
+        """
+        self.scope = _scope(base_url, username)
+        self._set("", "last_session", {"base_url": base_url, "username": username})
+
+    def last_session(self):
+        return self._get("", "last_session")
+
+    def remember_credentials(self, base_url, username, password):
+        """Store a salted hash of credentials the server just accepted."""
+        salt = os.urandom(16)
+        self._set(_scope(base_url, username), "credentials", {
+            "salt": salt.hex(),
+            "iterations": CREDENTIAL_ITERATIONS,
+            "hash": _derive(password, salt, CREDENTIAL_ITERATIONS),
+        })
+
+    def check_credentials(self, base_url, username, password):
+        """True if these credentials match the last ones verified online."""
+        stored = self._get(_scope(base_url, username), "credentials")
+        if not stored:
+            return False
+        digest = _derive(password, bytes.fromhex(stored["salt"]), stored["iterations"])
+        return hmac.compare_digest(digest, stored["hash"])
+
+    def _get(self, scope, key, default=None):
+        row = self.conn.execute(
+            "SELECT value FROM entries WHERE scope = ? AND key = ?", (scope, key)
+        ).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def _set(self, scope, key, value):
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO entries (scope, key, value, updated_at) VALUES (?, ?, ?, ?)",
+                (scope, key, json.dumps(value), time.time()),
+            )
+
+    def get(self, key, default=None):
+        if self.scope is None:
+            return default
+        return self._get(self.scope, key, default)
+
+    def set(self, key, value):
+        if self.scope is not None:
+            self._set(self.scope, key, value)
+
+    def delete(self, *keys):
+        if self.scope is None or not keys:
+            return
+        with self.conn:
+            self.conn.executemany(
+                "DELETE FROM entries WHERE scope = ? AND key = ?", [(self.scope, k) for k in keys]
+            )
+
+    def history(self):
+        return self.get("history", [])
+
+    def set_history(self, items):
+        self.set("history", items)
+
+    def summary(self, dataset_id):
+        return self.get(f"summary:{dataset_id}")
+
+    def set_summary(self, dataset_id, summary):
+        self.set(f"summary:{dataset_id}", summary)
+
+    def records(self, dataset_id):
+        return self.get(f"records:{dataset_id}", [])
+
+    def set_records(self, dataset_id, records):
+        if records and len(records) <= MAX_CACHED_RECORDS:
+            self.set(f"records:{dataset_id}", records)
+
+    def forget_datasets(self, ids):
+        self.delete(*[f"{kind}:{i}" for i in ids for kind in ("summary", "records")])
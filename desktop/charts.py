@@ -0,0 +1,77 @@
+"""Matplotlib chart canvases; imported on first paint to keep startup fast."""
+from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+from matplotlib.figure import Figure
+from matplotlib.patches import Circle
+
+
+class DoughnutCanvas(FigureCanvas):
+    def __init__(self, parent=None, width=5, height=4):
+        self.fig = Figure(figsize=(width, height), facecolor="#1e293b")
+        super().__init__(self.fig)
+        self.setParent(parent)
+        self.ax = self.fig.add_subplot(111)
+        self.ax.set_facecolor("#1e293b")
+        self.ax.tick_params(colors="white")
+        for spine in self.ax.spines.values():
+            spine.set_color("none")
+
+    def plot_distribution(self, type_dist):
+        self.ax.clear()
+        self.ax.set_facecolor("#1e293b")
+        self.ax.tick_params(colors="white")
+        if not type_dist:
+            self.ax.text(0.5, 0.5, "No data", ha="center", va="center", color="gray", fontsize=14)
+            self.draw()
+            return
+        labels = list(type_dist.keys())
+        sizes = list(type_dist.values())
+        colors = ["#3b82f6", "#10b981", "#f59e0b", "#ef4444", "#8b5cf6", "#ec4899"]
+        colors = colors[: len(labels)]
+        wedges, texts, autotexts = self.ax.pie(
+            sizes, labels=labels, autopct="%1.1f%%", colors=colors, startangle=90
+        )
+        for t in texts + autotexts:
+            t.set_color("white")
+        centre_circle = Circle((0, 0), 0.5, fc="#1e293b")
+        self.ax.add_artist(centre_circle)
+        self.draw()
+
+
+class BarCanvas(FigureCanvas):
+    def __init__(self, parent=None, width=5, height=4):
+        self.fig = Figure(figsize=(width, height), facecolor="#1e293b")
+        super().__init__(self.fig)
+        self.setParent(parent)
+        self.ax = self.fig.add_subplot(111)
+        self.ax.set_facecolor("#1e293b")
+        self.ax.tick_params(colors="white")
+        for spine in self.ax.spines.values():
+            spine.set_color("#334155")
+
+    def plot_averages(self, averages, outlier_counts=None):
+        self.ax.clear()
+        self.ax.set_facecolor("#1e293b")
+        self.ax.tick_params(colors="white")
+        for spine in self.ax.spines.values():
+            spine.set_color("#334155")
+        if not averages:
+            self.ax.text(0.5, 0.5, "No data", ha="center", va="center", color="gray", fontsize=14)
+            self.draw()
+            return
+        outlier_counts = outlier_counts or {}
+        labels = list(averages.keys())
+        values = [v or 0 for v in averages.values()]
+        colors = ["#ef4444" if outlier_counts.get(k) else "#3b82f6" for k in labels]
+        bars = self.ax.bar(labels, values, color=colors)
+        for bar, key in zip(bars, labels):
+            if outlier_counts.get(key):
+                self.ax.annotate(
+                    f"{outlier_counts[key]} outliers",
+                    (bar.get_x() + bar.get_width() / 2, bar.get_height()),
+                    ha="center",
+                    va="bottom",
+                    color="#fca5a5",
+                    fontsize=8,
+                )
+        self.ax.set_ylabel("Value", color="white")
+        self.draw()
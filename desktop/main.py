@@ -1,6 +1,9 @@
 """Chemical Equipment Parameter Visualizer - PyQt5 Desktop Client."""
 import sys
 import os
+import threading
+import time
+import uuid
 from pathlib import Path
 
 from PyQt5.QtWidgets import (
@@ -25,22 +28,110 @@ from PyQt5.QtWidgets import (
     QDialog,
     QDialogButtonBox,
     QGridLayout,
+    QProgressDialog,
 )
-from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QFont
-
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-from matplotlib.figure import Figure
-import matplotlib.pyplot as plt
-
-from api_client import EquipmentAPI, DEFAULT_BASE
+from PyQt5.QtCore import Qt, QObject, QTimer, pyqtSignal
+from PyQt5.QtGui import QColor, QFont
+
+from api_client import (
+    EquipmentAPI,
+    DEFAULT_BASE,
+    CHUNKED_UPLOAD_THRESHOLD,
+    EventsUnavailable,
+    describe_validation,
+    is_connection_error,
+)
+from cache import LocalCache
 
 # Add parent so we can load sample CSV from repo root
 REPO_ROOT = Path(__file__).resolve().parent.parent
+MAX_HISTORY = 5
+
+
+class EventListener(QObject):
+    """Background subscriber to the server's event stream; reconnects on drops.
+
+    Runs on a daemon thread so a stream blocked between keepalives never holds
+    up shutdown; events reach the GUI thread through a queued signal.
+    """
+
+    event_received = pyqtSignal(dict)
+
+    def __init__(self, api, parent=None):
+        super().__init__(parent)
+        self.api = api
+        self._stopped = False
+        self._last_event_id = None
+        self._thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped = True
+
+    def run(self):
+        while not self._stopped:
+            try:
+                for event in self.api.events(self._last_event_id, should_stop=lambda: self._stopped):
+                    if event.get("id"):
+                        self._last_event_id = event["id"]
+                    self.event_received.emit(event)
+            except EventsUnavailable:
+                return
+            except Exception:
+                pass
+            for _ in range(30):
+                if self._stopped:
+                    return
+                time.sleep(0.1)
+
+
+class BackgroundCall(QObject):
+    """Run ``fn`` on a daemon thread and deliver its result on the GUI thread."""
+
+    succeeded = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+    def __init__(self, fn, parent=None):
+        super().__init__(parent)
+        self.fn = fn
+
+    def start(self):
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def run(self):
+        try:
+            result = self.fn()
+        except Exception as e:
+            self.failed.emit(str(e))
+            return
+        self.succeeded.emit(result)
+
+
+class UploadCall(BackgroundCall):
+    """Chunked upload on a daemon thread; progress arrives as a queued signal."""
+
+    progress = pyqtSignal(int, int)
+
+    def __init__(self, api, path, name, parent=None):
+        super().__init__(self.upload, parent)
+        self.api = api
+        self.path = path
+        self.name = name
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def upload(self):
+        return self.api.upload_csv_chunked(
+            self.path, name=self.name, progress=self.progress.emit, should_stop=lambda: self.cancelled
+        )
 
 
 class LoginDialog(QDialog):
-    def __init__(self, parent=None):
+    def __init__(self, cache, parent=None):
         super().__init__(parent)
         self.setWindowTitle("Sign In")
         self.setMinimumWidth(320)
@@ -52,11 +143,15 @@ class LoginDialog(QDialog):
         self.pass_edit.setEchoMode(QLineEdit.Password)
         layout.addRow("Username:", self.user_edit)
         layout.addRow("Password:", self.pass_edit)
-        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
-        buttons.accepted.connect(self.accept)
-        buttons.rejected.connect(self.reject)
-        layout.addRow(buttons)
+        self.buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        self.buttons.accepted.connect(self.accept)
+        self.buttons.rejected.connect(self.reject)
+        layout.addRow(self.buttons)
+        self.cache = cache
         self.api = None
+        # History from an online sign-in; None when the window still has to
+        # confirm a sign-in accepted against the cached credentials.
+        self.history = None
         self.base_url = DEFAULT_BASE
 
     def accept(self):
@@ -66,12 +161,42 @@ class LoginDialog(QDialog):
             QMessageBox.warning(self, "Error", "Enter username.")
             return
         self.api = EquipmentAPI(self.base_url, user, password)
-        try:
-            self.api.login(user, password)
-        except Exception as e:
-            QMessageBox.critical(self, "Login Failed", str(e))
+        if self.cache.check_credentials(self.base_url, user, password):
+            # Same as the last online sign-in: open the cache now, verify later.
+            super().accept()
             return
-        super().accept()
+        api = self.api
+
+        def login():
+            try:
+                return api.login(user, password)
+            except Exception as e:
+                if is_connection_error(e):
+                    raise ConnectionError(
+                        f"{e}\n\nOffline use needs a previous online sign-in with these credentials."
+                    ) from e
+                raise
+
+        def succeeded(history):
+            self.buttons.setEnabled(True)
+            if self.api is not api or not self.isVisible():
+                return
+            self.cache.remember_credentials(self.base_url, user, password)
+            self.history = history
+            QDialog.accept(self)
+
+        def failed(err):
+            self.buttons.setEnabled(True)
+            if self.api is api and self.isVisible():
+                QMessageBox.critical(self, "Login Failed", err)
+
+        self.buttons.setEnabled(False)
+        call = BackgroundCall(login, self)
+        call.succeeded.connect(succeeded)
+        call.failed.connect(failed)
+        call.succeeded.connect(call.deleteLater)
+        call.failed.connect(call.deleteLater)
+        call.start()
 
 
 class SummaryCards(QFrame):
@@ -86,6 +211,7 @@ class SummaryCards(QFrame):
                 ("flowrate", "Avg Flowrate"),
                 ("pressure", "Avg Pressure"),
                 ("temperature", "Avg Temperature"),
+                ("outliers", "Outlier Rows"),
             ]
         ):
             lab = QLabel("—")
@@ -104,67 +230,50 @@ class SummaryCards(QFrame):
         self.labels["flowrate"].setText(str(av.get("Flowrate", "—")))
         self.labels["pressure"].setText(str(av.get("Pressure", "—")))
         self.labels["temperature"].setText(str(av.get("Temperature", "—")))
+        outliers = summary.get("outliers") or {}
+        status = outliers.get("status")
+        self.labels["outliers"].setText(
+            {"pending": "Pending…", "failed": "Failed"}.get(status, str(outliers.get("row_count", "—")))
+        )
 
 
-class DoughnutCanvas(FigureCanvas):
-    def __init__(self, parent=None, width=5, height=4):
-        self.fig = Figure(figsize=(width, height), facecolor="#1e293b")
-        super().__init__(self.fig)
-        self.setParent(parent)
-        self.ax = self.fig.add_subplot(111)
-        self.ax.set_facecolor("#1e293b")
-        self.ax.tick_params(colors="white")
-        for spine in self.ax.spines.values():
-            spine.set_color("none")
-
-    def plot_distribution(self, type_dist):
-        self.ax.clear()
-        self.ax.set_facecolor("#1e293b")
-        self.ax.tick_params(colors="white")
-        if not type_dist:
-            self.ax.text(0.5, 0.5, "No data", ha="center", va="center", color="gray", fontsize=14)
-            self.draw()
+class ChartPanel(QWidget):
+    """Placeholder that builds a matplotlib canvas from ``charts`` on first paint.
+
+    Data plotted before then is kept and drawn once the canvas exists.
+    """
+
+    def __init__(self, canvas_name, plot_name, parent=None):
+        super().__init__(parent)
+        self.canvas_name = canvas_name
+        self.plot_name = plot_name
+        self.canvas = None
+        self._pending = None
+        self._layout = QVBoxLayout(self)
+        self._layout.setContentsMargins(0, 0, 0, 0)
+        self.setMinimumSize(320, 240)
+
+    def plot(self, *args):
+        if self.canvas is None:
+            self._pending = args
             return
-        labels = list(type_dist.keys())
-        sizes = list(type_dist.values())
-        colors = ["#3b82f6", "#10b981", "#f59e0b", "#ef4444", "#8b5cf6", "#ec4899"]
-        colors = colors[: len(labels)]
-        wedges, texts, autotexts = self.ax.pie(
-            sizes, labels=labels, autopct="%1.1f%%", colors=colors, startangle=90
-        )
-        for t in texts + autotexts:
-            t.set_color("white")
-        centre_circle = plt.Circle((0, 0), 0.5, fc="#1e293b")
-        self.ax.add_artist(centre_circle)
-        self.draw()
-
-
-class BarCanvas(FigureCanvas):
-    def __init__(self, parent=None, width=5, height=4):
-        self.fig = Figure(figsize=(width, height), facecolor="#1e293b")
-        super().__init__(self.fig)
-        self.setParent(parent)
-        self.ax = self.fig.add_subplot(111)
-        self.ax.set_facecolor("#1e293b")
-        self.ax.tick_params(colors="white")
-        for spine in self.ax.spines.values():
-            spine.set_color("#334155")
-
-    def plot_averages(self, averages):
-        self.ax.clear()
-        self.ax.set_facecolor("#1e293b")
-        self.ax.tick_params(colors="white")
-        for spine in self.ax.spines.values():
-            spine.set_color("#334155")
-        if not averages:
-            self.ax.text(0.5, 0.5, "No data", ha="center", va="center", color="gray", fontsize=14)
-            self.draw()
+        getattr(self.canvas, self.plot_name)(*args)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        if self.canvas is None:
+            QTimer.singleShot(0, self._create_canvas)
+
+    def _create_canvas(self):
+        if self.canvas is not None:
             return
-        labels = list(averages.keys())
-        values = list(averages.values())
-        self.ax.bar(labels, values, color="#3b82f6")
-        self.ax.set_ylabel("Value", color="white")
-        self.draw()
+        import charts
+
+        self.canvas = getattr(charts, self.canvas_name)(self, width=4, height=3)
+        self._layout.addWidget(self.canvas)
+        if self._pending is not None:
+            self.plot(*self._pending)
+            self._pending = None
 
 
 class MainWindow(QMainWindow):
@@ -172,6 +281,10 @@ class MainWindow(QMainWindow):
         super().__init__()
         self.api = None
         self.current_data = None
+        self.history = []
+        self.listener = None
+        # No cache scope until sign-in; until then the window shows empty chrome.
+        self.cache = LocalCache()
         self.setWindowTitle("Chemical Equipment Parameter Visualizer (Desktop)")
         self.setMinimumSize(900, 700)
         self.resize(1000, 750)
@@ -215,13 +328,13 @@ class MainWindow(QMainWindow):
         charts_layout = QHBoxLayout()
         doughnut_group = QGroupBox("Equipment Type Distribution")
         doughnut_layout = QVBoxLayout(doughnut_group)
-        self.doughnut_canvas = DoughnutCanvas(self, width=4, height=3)
+        self.doughnut_canvas = ChartPanel("DoughnutCanvas", "plot_distribution")
         doughnut_layout.addWidget(self.doughnut_canvas)
         charts_layout.addWidget(doughnut_group, 1)
 
         bar_group = QGroupBox("Parameter Averages")
         bar_layout = QVBoxLayout(bar_group)
-        self.bar_canvas = BarCanvas(self, width=4, height=3)
+        self.bar_canvas = ChartPanel("BarCanvas", "plot_averages")
         bar_layout.addWidget(self.bar_canvas)
         charts_layout.addWidget(bar_group, 1)
         layout.addLayout(charts_layout)
@@ -243,11 +356,13 @@ class MainWindow(QMainWindow):
         self.current_data = {"summary": summary, "records": records or [], "dataset_id": dataset_id}
         self.cards.set_summary(summary)
         if summary:
-            self.doughnut_canvas.plot_distribution(summary.get("equipment_type_distribution", {}))
-            self.bar_canvas.plot_averages(summary.get("averages", {}))
+            self.doughnut_canvas.plot(summary.get("equipment_type_distribution", {}))
+            self.bar_canvas.plot(
+                summary.get("averages", {}), (summary.get("outliers") or {}).get("counts")
+            )
         else:
-            self.doughnut_canvas.plot_distribution({})
-            self.bar_canvas.plot_averages({})
+            self.doughnut_canvas.plot({})
+            self.bar_canvas.plot({})
         self.pdf_btn.setEnabled(bool(summary and (dataset_id or self.get_selected_history_id())))
         self.populate_table(records or [])
 
@@ -258,32 +373,134 @@ class MainWindow(QMainWindow):
     def populate_table(self, records):
         self.table.setRowCount(len(records))
         cols = ["Equipment Name", "Type", "Flowrate", "Pressure", "Temperature"]
+        outlier_bg = QColor("#fee2e2")
         for row, r in enumerate(records):
+            flagged = set(r.get("Outliers") or [])
             for col, key in enumerate(cols):
                 val = r.get(key, "")
-                self.table.setItem(row, col, QTableWidgetItem(str(val)))
+                item = QTableWidgetItem(str(val))
+                if flagged:
+                    item.setBackground(outlier_bg)
+                if key in flagged:
+                    item.setForeground(QColor("#b91c1c"))
+                    item.setToolTip(f"{key} is an outlier for its equipment type")
+                self.table.setItem(row, col, item)
         self.table.resizeColumnsToContents()
 
-    def refresh_history(self):
-        if not self.api:
+    def run_background(self, fn, on_success, label):
+        api = self.api
+
+        def current():
+            # Results for a session that has since signed out are dropped.
+            return self.api is api and self.cache.scope is not None
+
+        def succeeded(result):
+            if current():
+                on_success(result)
+
+        def failed(err):
+            if current():
+                self.statusBar().showMessage(f"Offline, showing cached data ({label}: {err})")
+
+        call = BackgroundCall(fn, self)
+        call.succeeded.connect(succeeded)
+        call.failed.connect(failed)
+        call.succeeded.connect(call.deleteLater)
+        call.failed.connect(call.deleteLater)
+        call.start()
+
+    def refresh_history(self, fetch=True):
+        """Render cached history at once, then revalidate it against the server."""
+        self.history = self.cache.history()
+        if not self.history and self.cache.scope is None:
             self.history_combo.clear()
             self.history_combo.addItem("(No history)", None)
+        else:
+            self.render_history()
+        if self.api and fetch:
+            self.run_background(self.api.history, self.on_history_loaded, "History")
+
+    def on_history_loaded(self, data):
+        if self.cache.scope is None:
             return
-        try:
-            data = self.api.history()
-            self.history_combo.blockSignals(True)
-            self.history_combo.clear()
-            self.history_combo.addItem("(Select or upload)", None)
-            for h in data:
-                self.history_combo.addItem(
-                    f"{h.get('name', '?')} ({h.get('row_count', 0)} rows)",
-                    h.get("id"),
-                )
-            self.history_combo.blockSignals(False)
-            if data and self.history_combo.currentData() is None:
-                self.history_combo.setCurrentIndex(1)
-        except Exception as e:
-            QMessageBox.warning(self, "History", f"Could not load history: {e}")
+        self.cache.set_history(data)
+        dropped = {h.get("id") for h in self.history} - {h.get("id") for h in data}
+        self.cache.forget_datasets(dropped)
+        self.history = data
+        self.render_history()
+
+    def render_history(self, select_id=None):
+        """Rebuild the combo from self.history, keeping the selection where possible."""
+        keep = select_id if select_id is not None else self.get_selected_history_id()
+        self.history_combo.blockSignals(True)
+        self.history_combo.clear()
+        self.history_combo.addItem("(Select or upload)", None)
+        for h in self.history:
+            self.history_combo.addItem(
+                f"{h.get('name', '?')} ({h.get('row_count', 0)} rows)",
+                h.get("id"),
+            )
+        idx = self.history_combo.findData(keep) if keep is not None else -1
+        self.history_combo.setCurrentIndex(max(idx, 0))
+        self.history_combo.blockSignals(False)
+        if self.history and self.history_combo.currentData() is None:
+            self.history_combo.setCurrentIndex(1)
+
+    def upsert_history(self, dataset, select=False):
+        self.history = [dataset] + [h for h in self.history if h.get("id") != dataset.get("id")]
+        self.history = self.history[:MAX_HISTORY]
+        self.cache.set_history(self.history)
+        self.cache.set_summary(dataset.get("id"), {
+            "id": dataset.get("id"),
+            "name": dataset.get("name"),
+            "uploaded_at": dataset.get("uploaded_at"),
+            "row_count": dataset.get("row_count"),
+            "summary": dataset.get("summary_json"),
+        })
+        self.render_history(select_id=dataset.get("id") if select else None)
+
+    def on_server_event(self, event):
+        if self.listener is None or self.sender() is not self.listener:
+            return  # queued by a listener stopped at sign-out
+        kind = event.get("event")
+        data = event.get("data") or {}
+        if kind == "dataset-created":
+            self.upsert_history(data)
+        elif kind == "dataset-trimmed":
+            ids = set(data.get("ids", []))
+            self.history = [h for h in self.history if h.get("id") not in ids]
+            self.cache.set_history(self.history)
+            self.cache.forget_datasets(ids)
+            self.render_history()
+        elif kind == "dataset-updated":
+            # Outliers for chunked uploads are flagged after the dataset is created.
+            self.history = [data if h.get("id") == data.get("id") else h for h in self.history]
+            self.cache.set_history(self.history)
+            self.on_summary_loaded({
+                "id": data.get("id"),
+                "name": data.get("name"),
+                "uploaded_at": data.get("uploaded_at"),
+                "row_count": data.get("row_count"),
+                "summary": data.get("summary_json"),
+            })
+        elif kind == "job-progress":
+            self.statusBar().showMessage(
+                f"Upload {data.get('stage', '')}: {int(data.get('progress', 0) * 100)}%", 5000
+            )
+
+    def start_listener(self):
+        self.stop_listener()
+        if not self.api:
+            return
+        self.listener = EventListener(self.api, self)
+        self.listener.event_received.connect(self.on_server_event)
+        self.listener.start()
+
+    def stop_listener(self):
+        if self.listener:
+            self.listener.stop()
+            self.listener.event_received.disconnect(self.on_server_event)
+            self.listener = None
 
     def on_history_selected(self):
         did = self.get_selected_history_id()
@@ -291,15 +508,19 @@ class MainWindow(QMainWindow):
             if not self.current_data:
                 self.set_current(None)
             return
-        try:
-            s = self.api.summary(did)
-            self.set_current(
-                s.get("summary"),
-                records=[],
-                dataset_id=s.get("id"),
-            )
-        except Exception as e:
-            QMessageBox.warning(self, "Summary", str(e))
+        cached = self.cache.summary(did)
+        if cached:
+            self.set_current(cached.get("summary"), records=self.cache.records(did), dataset_id=did)
+        if self.api:
+            self.run_background(lambda: self.api.summary(did), self.on_summary_loaded, "Summary")
+
+    def on_summary_loaded(self, s):
+        if self.cache.scope is None:
+            return
+        did = s.get("id")
+        self.cache.set_summary(did, s)
+        if did == self.get_selected_history_id():
+            self.set_current(s.get("summary"), records=self.cache.records(did), dataset_id=did)
 
     def do_upload(self):
         path, _ = QFileDialog.getOpenFileName(
@@ -307,21 +528,75 @@ class MainWindow(QMainWindow):
         )
         if not path:
             return
+        name = os.path.basename(path)
+        if os.path.getsize(path) > CHUNKED_UPLOAD_THRESHOLD:
+            self.upload_chunked(path, name)
+            return
         try:
-            result = self.api.upload_csv(path, name=os.path.basename(path))
-            summary = result.get("summary", {})
-            records = result.get("records", [])
-            dataset_id = result.get("dataset_id")
-            self.set_current(summary, records, dataset_id)
-            self.refresh_history()
-            # Select the newly uploaded one
-            for i in range(self.history_combo.count()):
-                if self.history_combo.itemData(i) == dataset_id:
-                    self.history_combo.setCurrentIndex(i)
-                    break
-            QMessageBox.information(self, "Upload", "File uploaded successfully.")
+            result = self.api.upload_csv(path, name=name, job_id=uuid.uuid4().hex)
         except Exception as e:
             QMessageBox.critical(self, "Upload Failed", str(e))
+            return
+        self.on_upload_done(name, result)
+
+    def on_upload_done(self, name, result):
+        summary = result.get("summary", {})
+        records = result.get("records", [])
+        dataset_id = result.get("dataset_id")
+        self.set_current(summary, records, dataset_id)
+        self.cache.set_records(dataset_id, records)
+        # Select the newly uploaded one; the matching event is an idempotent upsert
+        self.upsert_history(
+            {
+                "id": dataset_id,
+                "name": name,
+                "row_count": summary.get("total_count", len(records)),
+                "summary_json": summary,
+            },
+            select=True,
+        )
+        issues = describe_validation(summary.get("validation"))
+        QMessageBox.information(
+            self, "Upload", "File uploaded successfully." + (f"\n\n{issues}" if issues else "")
+        )
+
+    def upload_chunked(self, path, name):
+        """Upload in the background; the dialog tracks chunks and can cancel."""
+        call = UploadCall(self.api, path, name, self)
+        dialog = QProgressDialog("Uploading...", "Cancel", 0, 100, self)
+        dialog.setWindowTitle("Upload")
+        dialog.setWindowModality(Qt.WindowModal)
+        dialog.setMinimumDuration(0)
+        dialog.setAutoClose(False)
+        dialog.setAutoReset(False)
+
+        def on_progress(done, total):
+            dialog.setValue(int(done * 100 / total))
+            if done == total:
+                dialog.setLabelText("Processing on server...")
+
+        def on_cancel():
+            call.cancel()
+            self.statusBar().showMessage("Cancelling upload...")
+
+        def on_failed(err):
+            dialog.close()
+            if call.cancelled:
+                self.statusBar().showMessage("Upload cancelled", 5000)
+            else:
+                QMessageBox.critical(self, "Upload Failed", err)
+
+        def on_succeeded(result):
+            dialog.close()
+            self.on_upload_done(name, result)
+
+        call.progress.connect(on_progress)
+        call.succeeded.connect(on_succeeded)
+        call.failed.connect(on_failed)
+        call.succeeded.connect(call.deleteLater)
+        call.failed.connect(call.deleteLater)
+        dialog.canceled.connect(on_cancel)
+        call.start()
 
     def do_pdf(self):
         did = self.current_data.get("dataset_id") if self.current_data else None
@@ -335,35 +610,102 @@ class MainWindow(QMainWindow):
         )
         if not path:
             return
-        try:
-            self.api.download_pdf(did, path)
-            QMessageBox.information(self, "PDF", f"Report saved to:\n{path}")
-        except Exception as e:
-            QMessageBox.critical(self, "PDF Failed", str(e))
+        # Large reports take a while to render, so keep the window responsive.
+        self.pdf_btn.setEnabled(False)
+        self.statusBar().showMessage("Generating PDF report...")
+        call = BackgroundCall(lambda: self.api.download_pdf(did, path), self)
+
+        def finished(*_):
+            self.pdf_btn.setEnabled(bool(self.current_data and self.current_data.get("summary")))
+            self.statusBar().clearMessage()
+
+        call.succeeded.connect(finished)
+        call.failed.connect(finished)
+        call.succeeded.connect(lambda saved: QMessageBox.information(self, "PDF", f"Report saved to:\n{saved}"))
+        call.failed.connect(lambda err: QMessageBox.critical(self, "PDF Failed", err))
+        call.succeeded.connect(call.deleteLater)
+        call.failed.connect(call.deleteLater)
+        call.start()
 
     def do_logout(self):
+        self.stop_listener()
         self.api = None
         self.current_data = None
+        self.cache.scope = None
         self.set_current(None)
         self.refresh_history()
         self.show_login()
 
     def show_login(self):
-        d = LoginDialog(self)
+        d = LoginDialog(self.cache, self)
+        last = self.cache.last_session()
+        if last:
+            d.user_edit.setText(last.get("username", ""))
+            d.pass_edit.setFocus()
         if d.exec_() != QDialog.Accepted:
             QApplication.quit()
             return
         self.api = d.api
-        self.refresh_history()
+        self.cache.use_scope(self.api.base, self.api.username)
+        self.refresh_history(fetch=False)
         self.on_history_selected()
+        if d.history is not None:
+            self.on_history_loaded(d.history)
+        else:
+            self.verify_login()
+        self.start_listener()
+
+    def verify_login(self):
+        """Confirm with the server a sign-in accepted against the cached credentials.
+
+        The cache is already on screen. An unreachable server leaves the window
+        offline; rejected credentials sign out again.
+        """
+        api = self.api
+        self.statusBar().showMessage("Signing in...")
+
+        def login():
+            try:
+                return api.login(api.username, api.password)
+            except Exception as e:
+                if is_connection_error(e):
+                    return None
+                raise
+
+        def verified(history):
+            if self.api is not api:
+                return
+            if history is None:
+                self.statusBar().showMessage("Offline, showing cached data")
+                return
+            self.statusBar().clearMessage()
+            self.on_history_loaded(history)
+
+        def rejected(err):
+            if self.api is not api:
+                return
+            QMessageBox.critical(self, "Login Failed", err)
+            self.do_logout()
+
+        call = BackgroundCall(login, self)
+        call.succeeded.connect(verified)
+        call.failed.connect(rejected)
+        call.succeeded.connect(call.deleteLater)
+        call.failed.connect(call.deleteLater)
+        call.start()
+
+    def closeEvent(self, event):
+        self.stop_listener()
+        super().closeEvent(event)
 
 
 def main():
     app = QApplication(sys.argv)
     app.setStyle("Fusion")
+    # The window paints at once; sign-in follows on the event loop, then the cache renders.
     w = MainWindow()
-    w.show_login()
     w.show()
+    QTimer.singleShot(0, w.show_login)
     sys.exit(app.exec_())
 
 
@@ -1,5 +1,8 @@
-import React, { useState, useEffect } from 'react';
-import { login, logout, isAuthenticated, uploadCSV, getHistory, getSummary, downloadReportPdf } from './api';
+import React, { useState, useEffect, useRef } from 'react';
+import {
+  login, logout, isAuthenticated, uploadCSV, uploadCSVChunked, CHUNKED_UPLOAD_THRESHOLD,
+  getHistory, getSummary, downloadReportPdf, subscribeEvents,
+} from './api';
 import { Chart as ChartJS, ArcElement, Tooltip, Legend, CategoryScale, LinearScale, BarElement, Title } from 'chart.js';
 import { Doughnut, Bar } from 'react-chartjs-2';
 import './App.css';
@@ -7,6 +10,18 @@ import './App.css';
 ChartJS.register(ArcElement, Tooltip, Legend, CategoryScale, LinearScale, BarElement, Title);
 
 const COLORS = ['#3b82f6', '#10b981', '#f59e0b', '#ef4444', '#8b5cf6', '#ec4899'];
+const MAX_HISTORY = 5;
+const OUTLIER_COLOR = '#ef4444';
+
+function describeValidation(report) {
+  if (!report || !report.issue_count) return '';
+  const parts = report.issues.map((i) => `${i.check}${i.column ? ` in ${i.column}` : ''}: ${i.count} (rows ${i.rows.join(', ')}${i.count > i.rows.length ? ', ...' : ''})`);
+  return `${report.issue_count} data issue(s) found - ${parts.join('; ')}`;
+}
+
+function upsertHistory(list, dataset) {
+  return [dataset, ...list.filter((h) => h.id !== dataset.id)].slice(0, MAX_HISTORY);
+}
 
 function LoginForm({ onSuccess }) {
   const [username, setUsername] = useState('');
@@ -55,10 +70,13 @@ function LoginForm({ onSuccess }) {
 function AppContent() {
   const [uploading, setUploading] = useState(false);
   const [uploadError, setUploadError] = useState('');
+  const [uploadNotice, setUploadNotice] = useState('');
   const [data, setData] = useState(null);
   const [history, setHistory] = useState([]);
   const [selectedHistoryId, setSelectedHistoryId] = useState(null);
   const [loadingHistory, setLoadingHistory] = useState(false);
+  const [uploadProgress, setUploadProgress] = useState(null);
+  const uploadJobRef = useRef(null);
 
   const loadHistory = async () => {
     setLoadingHistory(true);
@@ -77,11 +95,28 @@ function AppContent() {
     loadHistory();
   }, []);
 
+  useEffect(() => subscribeEvents((evt) => {
+    if (evt.event === 'dataset-created') {
+      setHistory((list) => upsertHistory(list, evt.data));
+      setSelectedHistoryId((current) => current ?? evt.data.id);
+    } else if (evt.event === 'dataset-trimmed') {
+      const ids = evt.data.ids || [];
+      setHistory((list) => list.filter((h) => !ids.includes(h.id)));
+      setSelectedHistoryId((current) => (ids.includes(current) ? null : current));
+    } else if (evt.event === 'dataset-updated') {
+      // Outliers for chunked uploads are flagged after the dataset is created.
+      setHistory((list) => list.map((h) => (h.id === evt.data.id ? evt.data : h)));
+      setData((d) => (d?.dataset_id === evt.data.id ? { ...d, summary: evt.data.summary_json } : d));
+    } else if (evt.event === 'job-progress' && evt.data.job_id === uploadJobRef.current) {
+      setUploadProgress(evt.data);
+    }
+  }), []);
+
   useEffect(() => {
     if (!selectedHistoryId) return;
     let cancelled = false;
     getSummary(selectedHistoryId).then((s) => {
-      if (!cancelled) setData({ summary: s.summary, records: [], fromHistory: true });
+      if (!cancelled) setData({ summary: s.summary, records: [], fromHistory: true, dataset_id: selectedHistoryId });
     }).catch(() => {});
     return () => { cancelled = true; };
   }, [selectedHistoryId]);
@@ -90,15 +125,29 @@ function AppContent() {
     const file = e.target.files?.[0];
     if (!file) return;
     setUploadError('');
+    setUploadNotice('');
     setUploading(true);
+    uploadJobRef.current = `${Date.now().toString(36)}${Math.random().toString(36).slice(2)}`;
     try {
-      const result = await uploadCSV(file, file.name);
+      const result = file.size > CHUNKED_UPLOAD_THRESHOLD
+        ? await uploadCSVChunked(file, file.name, {
+          onProgress: (done, total) => setUploadProgress({ stage: 'sending', progress: done / total }),
+        })
+        : await uploadCSV(file, file.name, uploadJobRef.current);
       setData({ summary: result.summary, records: result.records || [], fromHistory: false, dataset_id: result.dataset_id });
-      loadHistory();
+      setUploadNotice(describeValidation(result.summary?.validation));
+      setHistory((list) => upsertHistory(list, {
+        id: result.dataset_id,
+        name: file.name,
+        row_count: result.summary?.total_count ?? 0,
+        summary_json: result.summary,
+      }));
     } catch (err) {
-      setUploadError(err.message || 'Upload failed');
+      setUploadError([err.message || 'Upload failed', describeValidation(err.validation)].filter(Boolean).join(': '));
     } finally {
       setUploading(false);
+      setUploadProgress(null);
+      uploadJobRef.current = null;
       e.target.value = '';
     }
   };
@@ -127,12 +176,15 @@ function AppContent() {
     }],
   };
 
+  const outlierCounts = summary?.outliers?.counts || {};
+  const params = ['Flowrate', 'Pressure', 'Temperature'];
+
   const barData = {
-    labels: ['Flowrate', 'Pressure', 'Temperature'],
+    labels: params.map((p) => (outlierCounts[p] ? `${p} (${outlierCounts[p]} outliers)` : p)),
     datasets: [{
       label: 'Average',
-      data: [averages.Flowrate, averages.Pressure, averages.Temperature],
-      backgroundColor: COLORS[0],
+      data: params.map((p) => averages[p]),
+      backgroundColor: params.map((p) => (outlierCounts[p] ? OUTLIER_COLOR : COLORS[0])),
     }],
   };
 
@@ -155,6 +207,10 @@ function AppContent() {
       </header>
 
       {uploadError && <div className="banner error">{uploadError}</div>}
+      {uploadNotice && <div className="banner info">{uploadNotice}</div>}
+      {uploading && uploadProgress && (
+        <div className="banner info">Uploading: {uploadProgress.stage} ({Math.round(uploadProgress.progress * 100)}%)</div>
+      )}
 
       <section className="history-section">
         <h2>History (last 5 datasets)</h2>
@@ -197,6 +253,18 @@ function AppContent() {
               <span className="card-label">Avg Temperature</span>
               <span className="card-value">{summary.averages?.Temperature ?? '-'}</span>
             </div>
+            {summary.outliers && (
+              <div className="card">
+                <span className="card-label">Outlier Rows</span>
+                <span className="card-value">
+                  {summary.outliers.status === 'pending'
+                    ? 'Pending…'
+                    : summary.outliers.status === 'failed'
+                      ? 'Failed'
+                      : summary.outliers.row_count}
+                </span>
+              </div>
+            )}
           </section>
 
           <section className="charts">
@@ -238,15 +306,19 @@ function AppContent() {
                 </tr>
               </thead>
               <tbody>
-                {records.map((row, i) => (
-                  <tr key={i}>
-                    <td>{row['Equipment Name']}</td>
-                    <td>{row.Type}</td>
-                    <td>{row.Flowrate}</td>
-                    <td>{row.Pressure}</td>
-                    <td>{row.Temperature}</td>
-                  </tr>
-                ))}
+                {records.map((row, i) => {
+                  const flagged = row.Outliers || [];
+                  const cell = (key) => (flagged.includes(key) ? 'outlier' : undefined);
+                  return (
+                    <tr key={i} className={flagged.length ? 'outlier-row' : undefined}>
+                      <td>{row['Equipment Name']}</td>
+                      <td>{row.Type}</td>
+                      <td className={cell('Flowrate')}>{row.Flowrate}</td>
+                      <td className={cell('Pressure')}>{row.Pressure}</td>
+                      <td className={cell('Temperature')}>{row.Temperature}</td>
+                    </tr>
+                  );
+                })}
               </tbody>
             </table>
           </div>
@@ -24,20 +24,134 @@ export function isAuthenticated() {
   return !!localStorage.getItem('equipment_auth');
 }
 
-export async function uploadCSV(file, name) {
+export async function uploadCSV(file, name, jobId) {
   const formData = new FormData();
   formData.append('file', file);
   if (name) formData.append('name', name);
+  if (jobId) formData.append('job_id', jobId);
   const res = await fetch(`${API_BASE}/upload/`, {
     method: 'POST',
     headers: getAuthHeader(),
     body: formData,
   });
   const data = await res.json().catch(() => ({}));
-  if (!res.ok) throw new Error(data.error || 'Upload failed');
+  if (!res.ok) {
+    const err = new Error(data.error || 'Upload failed');
+    err.validation = data.validation;
+    throw err;
+  }
   return data;
 }
 
+const CHUNK_SIZE = 4 * 1024 * 1024;
+// Files above this size use the resumable chunked upload.
+export const CHUNKED_UPLOAD_THRESHOLD = 8 * 1024 * 1024;
+
+async function sha256Hex(buffer) {
+  if (!window.crypto?.subtle) return null;
+  const digest = await window.crypto.subtle.digest('SHA-256', buffer);
+  return Array.from(new Uint8Array(digest)).map((b) => b.toString(16).padStart(2, '0')).join('');
+}
+
+async function putChunk(uploadId, index, blob, signal, retries = 3) {
+  const buffer = await blob.arrayBuffer();
+  const checksum = await sha256Hex(buffer);
+  const headers = { ...getAuthHeader(), 'Content-Type': 'application/octet-stream' };
+  if (checksum) headers['X-Chunk-SHA256'] = checksum;
+  for (let attempt = 0; ; attempt += 1) {
+    try {
+      const res = await fetch(`${API_BASE}/uploads/${uploadId}/chunks/${index}/`, {
+        method: 'PUT', headers, body: buffer, signal,
+      });
+      if (res.ok) return;
+      const data = await res.json().catch(() => ({}));
+      if (res.status === 400 || res.status === 404) {
+        throw Object.assign(new Error(data.error || 'Chunk rejected'), { fatal: true });
+      }
+      throw new Error(data.error || 'Chunk upload failed');
+    } catch (err) {
+      if (err.fatal || signal.aborted || attempt >= retries - 1) throw err;
+      await new Promise((resolve) => setTimeout(resolve, 1000 * 2 ** attempt));
+    }
+  }
+}
+
+// Workers share one AbortController: the first failure stops them all and
+// cancels requests in flight, so nothing keeps uploading after an error.
+async function sendChunks(file, uploadId, indices, chunkSize, concurrency, onChunk) {
+  const queue = [...indices];
+  const controller = new AbortController();
+  const worker = async () => {
+    while (queue.length && !controller.signal.aborted) {
+      const index = queue.shift();
+      try {
+        await putChunk(uploadId, index, file.slice(index * chunkSize, (index + 1) * chunkSize), controller.signal);
+      } catch (err) {
+        controller.abort();
+        throw err;
+      }
+      onChunk();
+    }
+  };
+  await Promise.all(Array.from({ length: Math.min(concurrency, indices.length) }, worker));
+}
+
+// Resumable upload: init, PUT checksummed chunks in parallel, finalize.
+// Retrying the same file after a failure resumes from what the server already has.
+export async function uploadCSVChunked(file, name, { mode, chunkSize = CHUNK_SIZE, concurrency = 4, onProgress } = {}) {
+  const resumeKey = `equipment_upload:${file.name}:${file.size}:${file.lastModified}`;
+  let status = null;
+  const pending = localStorage.getItem(resumeKey);
+  if (pending) {
+    const res = await fetch(`${API_BASE}/uploads/${pending}/`, { headers: getAuthHeader() });
+    if (res.ok) status = await res.json();
+  }
+  if (!status) {
+    const res = await fetch(`${API_BASE}/uploads/`, {
+      method: 'POST',
+      headers: { ...getAuthHeader(), 'Content-Type': 'application/json' },
+      body: JSON.stringify({ name: name || file.name, size: file.size, chunk_size: chunkSize, ...(mode ? { mode } : {}) }),
+    });
+    status = await res.json().catch(() => ({}));
+    if (!res.ok) throw new Error(status.error || 'Upload failed');
+    localStorage.setItem(resumeKey, status.upload_id);
+  }
+  const { upload_id: uploadId, total_chunks: total } = status;
+  const received = new Set(status.received);
+  let missing = [...Array(total).keys()].filter((i) => !received.has(i));
+  let done = total - missing.length;
+  const onChunk = () => {
+    done += 1;
+    if (onProgress) onProgress(done, total);
+  };
+  let resends = 0;
+  for (;;) {
+    await sendChunks(file, uploadId, missing, status.chunk_size, concurrency, onChunk);
+    const res = await fetch(`${API_BASE}/uploads/${uploadId}/finalize/`, { method: 'POST', headers: getAuthHeader() });
+    const data = await res.json().catch(() => ({}));
+    if (res.status === 409) {
+      missing = data.missing || [];
+      if (missing.length) {
+        resends += 1;
+        if (resends >= 5) break;
+      } else {
+        // The server is still parsing; each finalize call parses a few more chunks.
+        await new Promise((resolve) => setTimeout(resolve, 500));
+      }
+      continue;
+    }
+    if (res.status === 400) localStorage.removeItem(resumeKey);
+    if (!res.ok) {
+      const err = new Error(data.error || 'Upload failed');
+      err.validation = data.validation;
+      throw err;
+    }
+    localStorage.removeItem(resumeKey);
+    return data;
+  }
+  throw new Error('Upload could not be finalized; try again to resume.');
+}
+
 export async function getHistory() {
   const res = await fetch(`${API_BASE}/history/`, { headers: getAuthHeader() });
   if (!res.ok) throw new Error('Failed to load history');
@@ -64,3 +178,70 @@ export async function downloadReportPdf(datasetId) {
   a.click();
   URL.revokeObjectURL(url);
 }
+
+function parseSSE(block) {
+  const event = { id: null, event: 'message', data: '' };
+  const data = [];
+  for (const line of block.split('\n')) {
+    if (!line || line.startsWith(':')) continue;
+    const idx = line.indexOf(':');
+    const field = idx === -1 ? line : line.slice(0, idx);
+    const value = idx === -1 ? '' : line.slice(idx + 1).replace(/^ /, '');
+    if (field === 'id') event.id = value;
+    else if (field === 'event') event.event = value;
+    else if (field === 'data') data.push(value);
+  }
+  if (!data.length) return null;
+  try {
+    event.data = JSON.parse(data.join('\n'));
+  } catch {
+    event.data = data.join('\n');
+  }
+  return event;
+}
+
+// EventSource cannot send the Basic auth header, so the stream is read with fetch.
+// Reconnects with Last-Event-ID after drops; returns an unsubscribe function.
+export function subscribeEvents(onEvent) {
+  const controller = new AbortController();
+  let lastEventId = null;
+  let retryMs = 3000;
+
+  const connect = async () => {
+    while (!controller.signal.aborted) {
+      try {
+        const headers = { ...getAuthHeader(), Accept: 'text/event-stream' };
+        if (lastEventId) headers['Last-Event-ID'] = lastEventId;
+        const res = await fetch(`${API_BASE}/events/`, { headers, signal: controller.signal });
+        // 501/503: the server cannot stream (e.g. runs under WSGI); retrying would not help.
+        if (res.status === 501 || res.status === 503) return;
+        if (!res.ok || !res.body) throw new Error('Event stream unavailable');
+        const reader = res.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        for (;;) {
+          const { value, done } = await reader.read();
+          if (done) break;
+          buffer += decoder.decode(value, { stream: true }).replace(/\r\n/g, '\n');
+          let sep;
+          while ((sep = buffer.indexOf('\n\n')) !== -1) {
+            const block = buffer.slice(0, sep);
+            buffer = buffer.slice(sep + 2);
+            const retry = block.match(/^retry: (\d+)$/m);
+            if (retry) retryMs = Number(retry[1]);
+            const event = parseSSE(block);
+            if (!event) continue;
+            if (event.id) lastEventId = event.id;
+            onEvent(event);
+          }
+        }
+      } catch {
+        if (controller.signal.aborted) return;
+      }
+      await new Promise((resolve) => setTimeout(resolve, retryMs));
+    }
+  };
+
+  connect();
+  return () => controller.abort();
+}